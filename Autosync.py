@@ -0,0 +1,116 @@
+import numpy as np
+import Waveform
+
+
+# one envelope value per FRAME_MS of audio, 2 hours are 360k values
+FRAME_MS = 20
+# offsets further off than this are not searched
+MAX_OFFSET_MS = 120000
+# framerate mismatches a subtitle is likely made for, tried before the drift is measured
+FACTORS = (1.0, 25 / 23.976, 23.976 / 25, 25 / 24, 24 / 25, 24 / 23.976, 23.976 / 24, 30 / 29.97, 29.97 / 30)
+# drift is measured on windows of this length, a file needs two of them
+WINDOW_MS = 600000
+# a window is matched over this range of lags, and kept if its peak is not further off than WINDOW_OFFSET_MS
+WINDOW_SEARCH_MS = 30000
+WINDOW_OFFSET_MS = 5000
+# a peak less than this many standard deviations above the rest of the correlation is no match
+MIN_SCORE = 5.0
+
+
+def voice_envelope(chunks, rate=Waveform.SAMPLE_RATE, frame_ms=FRAME_MS, cancelled=None):
+    """ 1.0 for the frames of the audio chunks that likely hold speech, 0.0 for the rest
+
+    the energy of the first difference of the samples is taken per frame, it leaves out most of
+    the hum and bass, and a frame counts as voiced when it is well above the noise floor of the file.
+    None if cancelled() turned true on the way, ValueError if there is not one frame of audio.
+    """
+    frame = rate * frame_ms // 1000
+    energies = []
+    rest = np.zeros(0, dtype=np.int16)
+    for chunk in chunks:
+        if cancelled is not None and cancelled():
+            return None
+        samples = np.concatenate((rest, chunk)) if len(rest) else chunk
+        usable = len(samples) - len(samples) % frame
+        block = samples[:usable].reshape(-1, frame).astype(np.float32)
+        energies.append(np.log10(np.mean(np.diff(block, axis=1) ** 2, axis=1) + 1.0))
+        rest = samples[usable:]
+    energy = np.concatenate(energies) if energies else np.zeros(0, dtype=np.float32)
+    if not len(energy):
+        # no audio stream, or less audio than one frame
+        raise ValueError("the media file has no audio to match the subtitle to")
+    floor, loud = np.percentile(energy, (20, 95))
+    return (energy > floor + 0.3 * (loud - floor)).astype(np.float32)
+
+
+def cue_timeline(starts, ends, length, frame_ms=FRAME_MS):
+    """ 1.0 for the frames a cue is shown in, 0.0 between cues, length frames long """
+    starts = np.clip(np.asarray(starts, dtype=np.int64) // frame_ms, 0, length)
+    ends = np.clip(np.asarray(ends, dtype=np.int64) // frame_ms, 0, length)
+    edges = np.zeros(length + 1, dtype=np.int32)
+    np.add.at(edges, starts, 1)
+    np.add.at(edges, ends, -1)
+    return (np.cumsum(edges[:-1]) > 0).astype(np.float32)
+
+
+def correlate(audio, cues, max_lag):
+    """ the lag (frames) cues have to be moved by to match audio best, and how far the peak stands out
+
+    the cross-correlation of all lags at once is the inverse FFT of one spectrum times the
+    conjugate of the other, n log n instead of a product of the lengths.
+    """
+    if not len(audio) or not len(cues):
+        raise ValueError("there is no audio or no cue to match")
+    audio = audio - audio.mean()
+    cues = cues - cues.mean()
+    n = 1 << (len(audio) + len(cues)).bit_length()
+    max_lag = min(max_lag, n // 2 - 1)
+    correlation = np.fft.irfft(np.fft.rfft(audio, n) * np.conj(np.fft.rfft(cues, n)), n)
+    # lags 0..max_lag are at the start, the negative ones wrap around to the end
+    candidates = np.concatenate((correlation[n - max_lag:], correlation[:max_lag + 1]))
+    best = int(np.argmax(candidates))
+    score = (candidates[best] - candidates.mean()) / (candidates.std() + 1e-9)
+    return best - max_lag, float(score)
+
+
+def estimate(audio, starts, ends, frame_ms=FRAME_MS, drift=True):
+    """ (offset ms, factor, score) so that start * factor + offset puts the cues on the voices of audio
+
+    the offset is found over the whole file for every factor of FACTORS, then, with drift, every
+    window is matched again close to the best one and a line through the window offsets refines it.
+    """
+    starts = np.asarray(starts, dtype=np.float64)
+    ends = np.asarray(ends, dtype=np.float64)
+    if not len(starts):
+        raise ValueError("the subtitle has no cues")
+    score, lag, factor = max((*correlate(audio, cue_timeline(starts * f, ends * f, len(audio), frame_ms),
+                                         MAX_OFFSET_MS // frame_ms)[::-1], f) for f in FACTORS)
+    offset = lag * frame_ms
+    window = WINDOW_MS // frame_ms
+    if not drift or score < MIN_SCORE or len(audio) < 2 * window:
+        return offset, factor, score
+    shifted = cue_timeline(starts * factor + offset, ends * factor + offset, len(audio), frame_ms)
+    centers, offsets, weights = [], [], []
+    for first in range(0, len(audio) - window + 1, window):
+        local, local_score = correlate(audio[first:first + window], shifted[first:first + window],
+                                       WINDOW_SEARCH_MS // frame_ms)
+        if local_score >= MIN_SCORE and abs(local * frame_ms) <= WINDOW_OFFSET_MS:
+            centers.append((first + window / 2) * frame_ms)
+            offsets.append(offset + local * frame_ms)
+            weights.append(local_score)
+    if len(centers) < 2:
+        return offset, factor, score
+    # with the cues at u = start * factor and the voices at t = drift * u + b, the offset t - u
+    # measured at t is a line with slope 1 - 1 / drift
+    slope, intercept = np.polyfit(centers, offsets, 1, w=weights)
+    drift = 1.0 / (1.0 - slope)
+    return float(intercept * drift), float(factor * drift), score
+
+
+def transform(offset, factor):
+    """ the time map of an estimate, for Resync.retime """
+    return lambda times: times * factor + offset
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,208 @@
+""" subtitle and media work on whole folders without a display, PySide6 is never imported
+
+    python Batch.py validate ~/Videos                 report broken, unsorted and empty cues
+    python Batch.py validate --normalize ~/Videos     and rewrite those files sorted, in UTF-8
+    python Batch.py convert --to srt ~/Videos         write <name>.srt next to every .vtt/.ass
+    python Batch.py cache ~/Videos                    build the cue caches, keyframe indexes and waveforms
+    python Batch.py probe ~/Videos                    probe the videos that are not in data.db yet
+
+every file is one task of a process pool, each finished task prints its time and throughput.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import Database
+import Functions
+import Media_probe
+import Keyframes
+import Subtitle_parser
+
+
+def collect(paths, extensions):
+    """ the files below paths (files or folders) with one of extensions, sorted """
+    found = []
+    for path in paths:
+        if os.path.isfile(path):
+            if os.path.splitext(path)[1].lower() in extensions:
+                found.append(os.path.abspath(path))
+            continue
+        for directory, _, names in os.walk(path):
+            found.extend(os.path.abspath(os.path.join(directory, name)) for name in names
+                         if os.path.splitext(name)[1].lower() in extensions)
+    return sorted(set(found))
+
+
+def check_cues(filename):
+    """ read the cues in file order, return (cues sorted by start, problems) """
+    problems = {"encoding": None, "unsorted": 0, "broken": 0, "empty": 0}
+    with open(filename, "rb") as f:
+        encoding = Subtitle_parser.sniff_encoding(f.read(Subtitle_parser.SNIFF_BYTES))
+    if encoding not in ("utf-8", "utf-8-sig"):
+        problems["encoding"] = encoding
+    # the events of an .ass file are in style and layer order, only .vtt/.srt cues are expected sorted
+    ordered = Subtitle_parser.writable(filename)
+    cues, last_start = [], None
+    for start, end, text in Subtitle_parser.parser_for(filename)(Subtitle_parser.iter_file_lines(filename)):
+        if not text.strip():
+            problems["empty"] += 1
+            continue
+        if end < start:
+            problems["broken"] += 1
+            end = start
+        if ordered and last_start is not None and start < last_start:
+            problems["unsorted"] += 1
+        last_start = start
+        cues.append((start, end, text.decode("utf-8", "replace")))
+    cues.sort(key=lambda cue: cue[0])
+    return cues, problems
+
+
+def validate(filename, normalize):
+    cues, problems = check_cues(filename)
+    found = {name: count for name, count in problems.items() if count}
+    detail = f"{len(cues)} cues" + "".join(f", {name} {count}" for name, count in found.items())
+    ok = not found
+    if normalize and found:
+        if not Subtitle_parser.writable(filename):
+            detail += ", not normalized, this format is not written"
+        else:
+            # sorted, broken end times set to the start, empty cues left out, written as UTF-8
+            Subtitle_parser.write_cues(filename, cues)
+            detail += ", normalized"
+            ok = True
+    return {"ok": ok, "items": len(cues), "detail": detail}
+
+
+def convert(filename, extension, force):
+    target = os.path.splitext(filename)[0] + extension
+    if os.path.splitext(filename)[1].lower() == extension:
+        return {"ok": True, "items": 0, "detail": "already " + extension}
+    if os.path.exists(target) and not force:
+        return {"ok": True, "items": 0, "detail": os.path.basename(target) + " exists, --force to replace it"}
+    cues, _ = check_cues(filename)
+    Subtitle_parser.write_cues(target, cues)
+    return {"ok": True, "items": len(cues), "detail": f"{len(cues)} cues to {os.path.basename(target)}"}
+
+
+def cache_subtitle(filename):
+    if Subtitle_parser.load_cached(filename) is not None:
+        return {"ok": True, "items": 0, "detail": "cached already"}
+    count = sum(len(batch) for batch in Subtitle_parser.load_batches_cached(filename))
+    return {"ok": True, "items": count, "detail": f"{count} cues cached"}
+
+
+def cache_media(filename):
+    """ the waveform is written by the worker, the keyframes go back to the parent for data.db """
+    import Waveform
+    levels = Waveform.load_pyramid(filename)
+    times = Keyframes.build(filename)
+    return {"ok": times is not None, "items": len(times or ()),
+            "keyframes": None if times is None else times.tobytes(),
+            "detail": f"{len(times or ())} keyframes, {len(levels)} waveform levels"}
+
+
+def probe(filename):
+    """ the info goes back to the parent, only it writes data.db """
+    info = Media_probe.run_ffprobe(filename) if Media_probe.ffprobe_binary() else Media_probe.run_moviepy(filename)
+    return {"ok": True, "items": 1, "info": info,
+            "detail": f"{info['duration'] or 0:.1f}s {info['width']}x{info['height']} {info['codec'] or ''}".rstrip()}
+
+
+def run_task(task, filename, *args):
+    """ run in a worker process, time task(filename, *args) and never raise """
+    start = time.perf_counter()
+    try:
+        result = task(filename, *args)
+    except Exception as e:
+        # one unreadable file must not stop the night's run
+        result = {"ok": False, "items": 0, "detail": f"{type(e).__name__}: {e}"}
+    result["seconds"] = time.perf_counter() - start
+    try:
+        # a file that was skipped was not read, it does not count for the throughput
+        result["bytes"] = os.path.getsize(filename) if result["items"] else 0
+    except OSError:
+        result["bytes"] = 0
+    result["path"] = filename
+    return result
+
+
+def report_line(result):
+    seconds = max(result["seconds"], 1e-9)
+    rate = ""
+    if result["items"]:
+        rate = f"{result['bytes'] / seconds / 1e6:8.2f} MB/s {result['items'] / seconds:10.0f} items/s"
+    return f"{'ok  ' if result['ok'] else 'FAIL'} {result['seconds'] * 1000:9.1f} ms {rate:<33} {result['detail']}   {result['path']}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--report", help="also write every result and the totals to this JSON file")
+    parser.add_argument("--db", help="data.db to read and write instead of the one next to the player")
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser("validate", help="check subtitle files")
+    command.add_argument("--normalize", action="store_true", help="rewrite the files that have problems")
+    command.add_argument("paths", nargs="+")
+    command = commands.add_parser("convert", help="write every subtitle in another format")
+    command.add_argument("--to", choices=sorted(ext[1:] for ext in Subtitle_parser.WRITERS), required=True)
+    command.add_argument("--force", action="store_true", help="replace files that exist")
+    command.add_argument("paths", nargs="+")
+    command = commands.add_parser("cache", help="build the caches the player would build on first use")
+    command.add_argument("--no-media", action="store_true", help="only the cue caches of the subtitles")
+    command.add_argument("paths", nargs="+")
+    command = commands.add_parser("probe", help="probe the videos into data.db")
+    command.add_argument("paths", nargs="+")
+    args = parser.parse_args()
+    if args.db:
+        Database.DB_PATH = os.path.abspath(args.db)
+
+    subtitles = Functions.SUBTITLE_FORMATS
+    if args.command == "validate":
+        tasks = [(validate, f, args.normalize) for f in collect(args.paths, subtitles)]
+    elif args.command == "convert":
+        tasks = [(convert, f, "." + args.to, args.force) for f in collect(args.paths, subtitles)]
+    elif args.command == "cache":
+        tasks = [(cache_subtitle, f) for f in collect(args.paths, subtitles)]
+        if not args.no_media:
+            Keyframes.create_table()
+            tasks += [(cache_media, f) for f in collect(args.paths, Functions.FORMAT_LIST)
+                      if Keyframes.cached(f) is None]
+    else:
+        Media_probe.create_table()
+        tasks = [(probe, f) for f in collect(args.paths, Functions.FORMAT_LIST) if Media_probe.cached(f) is None]
+
+    started = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        futures = [pool.submit(run_task, *task) for task in tasks]
+        for future in as_completed(futures):
+            result = future.result()
+            # the workers never touch data.db, so there is one writer and no lock contention
+            info = result.pop("info", None)
+            if info is not None:
+                Media_probe.store(result["path"], info)
+            keyframes = result.pop("keyframes", None)
+            if keyframes is not None:
+                Keyframes.store(result["path"], array('i', keyframes))
+            results.append(result)
+            print(report_line(result), flush=True)
+    Database.close()
+
+    wall = time.perf_counter() - started
+    failed = sum(not r["ok"] for r in results)
+    total_bytes = sum(r["bytes"] for r in results)
+    print(f"{len(results)} files, {failed} failed, {wall:.2f}s, "
+          f"{len(results) / max(wall, 1e-9):.1f} files/s, {total_bytes / max(wall, 1e-9) / 1e6:.2f} MB/s")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"command": args.command, "seconds": wall, "files": len(results), "failed": failed,
+                       "bytes": total_bytes, "results": sorted(results, key=lambda r: r["path"])}, f, indent=4)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
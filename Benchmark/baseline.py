@@ -0,0 +1,36 @@
+import json
+import os
+
+
+def load(filename):
+    if not os.path.isfile(filename):
+        return {}
+    with open(filename, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save(filename, results):
+    with open(filename, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=4, sort_keys=True)
+    print("baseline saved to " + filename)
+
+
+def compare(results, baseline, tolerance):
+    """ print every result next to its baseline, return the names that got slower than baseline * (1 + tolerance) """
+    regressions = []
+    for name, value in sorted(results.items()):
+        old = baseline.get(name)
+        if old is None:
+            print(f"{name:<45}{value:>14.3f}   (no baseline)")
+            continue
+        change = (value - old) / old if old else 0.0
+        flag = ""
+        if change > tolerance:
+            regressions.append(name)
+            flag = "   REGRESSION"
+        print(f"{name:<45}{value:>14.3f}{old:>14.3f}{change:>+9.1%}{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    pass
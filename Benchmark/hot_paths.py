@@ -0,0 +1,153 @@
+""" subtitle lookup, time conversion, subtitle loading and sqlite round-trips, without a display
+
+    python Benchmark/hot_paths.py              compare with Benchmark/hot_paths_baseline.json
+    python Benchmark/hot_paths.py --update     save the current numbers as the baseline
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import baseline
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, ROOT)
+import Database
+import Functions
+import Subtitle_parser
+
+
+BASELINE_FILE = os.path.join(ROOT, "Benchmark", "hot_paths_baseline.json")
+SIZES = {"1k": 1000, "10k": 10000, "100k": 100000}
+# a 25 fps player asks for the subtitle of every frame
+FRAME_MS = 40
+
+
+def make_vtt(filename, count, seed=0):
+    """ write a synthetic subtitle with count cues, some of them two lines long or overlapping """
+    rng = random.Random(seed)
+    with open(filename, "w", encoding="utf-8", newline="\n") as f:
+        f.write("WEBVTT\n\n")
+        start = 0
+        for i in range(count):
+            start += rng.randint(800, 4000)
+            end = start + rng.randint(700, 5000)
+            text = f"line {i} " + "x" * rng.randint(5, 40)
+            if i % 7 == 0:
+                text += "\nsecond line"
+            f.write(f"{i + 1}\n{Functions.change_position_into_time(start)} --> "
+                    f"{Functions.change_position_into_time(end)}\n{text}\n\n")
+    return start
+
+
+def best(function, repeat):
+    """ seconds of the fastest of repeat runs, the slower ones only measure what else the machine did """
+    times = []
+    # like timeit, a collection in the middle of a run is not what is measured
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return min(times)
+
+
+def bench_subtitles(tmp, repeat):
+    results = {}
+    for label, count in SIZES.items():
+        filename = os.path.join(tmp, f"cues_{label}.vtt")
+        last = make_vtt(filename, count)
+        results[f"subtitle.load_{label}_ms"] = best(lambda: Subtitle_parser.load_file(filename), repeat) * 1000
+
+        store = Subtitle_parser.load_file(filename)
+        # playback-like positions over the first hour or so, and random seeks over the whole file
+        sequential = range(0, min(last, 100000 * FRAME_MS), FRAME_MS)
+        rng = random.Random(1)
+        seeks = [rng.randint(0, last) for _ in range(20000)]
+
+        def play():
+            for position in sequential:
+                Functions.get_subtitle(position, store)
+
+        def seek():
+            for position in seeks:
+                Functions.get_subtitle(position, store)
+        results[f"subtitle.get_sequential_{label}_us"] = best(play, repeat) / len(sequential) * 1e6
+        results[f"subtitle.get_random_{label}_us"] = best(seek, repeat) / len(seeks) * 1e6
+    return results
+
+
+def bench_time_conversion(repeat):
+    rng = random.Random(2)
+    positions = [rng.randint(0, 5 * 3600 * 1000) for _ in range(50000)]
+    times = [Functions.change_position_into_time(p) for p in positions]
+
+    def to_time():
+        for p in positions:
+            Functions.change_position_into_time(p)
+
+    def to_position():
+        for t in times:
+            Functions.change_time_into_position(t)
+    return {"time.position_into_time_us": best(to_time, repeat) / len(positions) * 1e6,
+            "time.time_into_position_us": best(to_position, repeat) / len(times) * 1e6}
+
+
+def bench_sqlite(tmp, repeat):
+    Database.DB_PATH = os.path.join(tmp, "data.db")
+    Database.execute('''CREATE TABLE IF NOT EXISTS BENCH
+                (ID INT PRIMARY KEY NOT NULL,
+                    VALUE INT NOT NULL);''')
+    count = 2000
+
+    def update():
+        for i in range(count):
+            Functions.sqlite_update("INSERT OR REPLACE INTO BENCH (ID, VALUE) VALUES (?, ?);", (i, i))
+        # an update only counts once it is committed
+        Database.flush()
+
+    def fetch():
+        for i in range(count):
+            Functions.sqlite_fetch("SELECT VALUE FROM BENCH WHERE ID = ?;", (i,))
+    results = {"sqlite.update_us": best(update, repeat) / count * 1e6,
+               "sqlite.fetch_us": best(fetch, repeat) / count * 1e6}
+    Database.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each benchmark in a round")
+    parser.add_argument("--rounds", type=int, default=3,
+                        help="the suite is run this many times, the best of all rounds is kept")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown, 0.25 is 25%%")
+    parser.add_argument("--update", action="store_true", help="save the results as the new baseline")
+    args = parser.parse_args()
+
+    # the rounds spread the runs of one benchmark over time, a slow spell of the machine only hits some of them
+    results = {}
+    for _ in range(args.rounds):
+        with tempfile.TemporaryDirectory() as tmp:
+            current = bench_subtitles(tmp, args.repeat)
+            current.update(bench_time_conversion(args.repeat))
+            current.update(bench_sqlite(tmp, args.repeat))
+        for name, value in current.items():
+            results[name] = min(value, results.get(name, value))
+
+    if args.update:
+        baseline.save(BASELINE_FILE, results)
+        return 0
+    regressions = baseline.compare(results, baseline.load(BASELINE_FILE), args.tolerance)
+    if regressions:
+        print("hot paths got slower: " + ", ".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+""" time-to-first-window and peak RSS (peak working set on windows) of the player, without a display
+
+    python Benchmark/startup.py              compare with Benchmark/startup_baseline.json
+    python Benchmark/startup.py --update     save the current numbers as the baseline
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import baseline
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+BASELINE_FILE = os.path.join(ROOT, "Benchmark", "startup_baseline.json")
+
+# runs in a fresh interpreter so every import is paid again,
+# the window is shown against a copy of data.db so the real one is not touched
+CHILD = r'''
+import sys
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        # windows has no getrusage, the peak working set comes from psapi
+        import ctypes
+        from ctypes import wintypes
+
+        class counters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        ctypes.windll.kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+        get_info = ctypes.windll.psapi.GetProcessMemoryInfo
+        get_info.argtypes = (wintypes.HANDLE, ctypes.POINTER(counters), wintypes.DWORD)
+        info = counters()
+        info.cb = ctypes.sizeof(info)
+        get_info(ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(info), info.cb)
+        return info.PeakWorkingSetSize / 2 ** 20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB on linux
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+
+import Database
+Database.DB_PATH = sys.argv[1]
+from PySide6.QtWidgets import QApplication
+app = QApplication([])
+import main
+main.initialize_database()
+win = main.Player.MainWindow()
+app.processEvents()
+print("shown", flush=True)
+print(peak_rss_mb(), flush=True)
+'''
+
+
+def run_once(db_copy):
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    start = time.perf_counter()
+    child = subprocess.Popen([sys.executable, "-c", CHILD, db_copy], cwd=ROOT, env=env,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    shown = None
+    for line in child.stdout:
+        if line.strip() == "shown":
+            shown = (time.perf_counter() - start) * 1000
+            break
+    rest, err = child.communicate()
+    if shown is None or child.returncode != 0:
+        raise RuntimeError("the player did not start:\n" + err)
+    return shown, float(rest.split()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown, 0.2 is 20%%")
+    parser.add_argument("--update", action="store_true", help="save the results as the new baseline")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_copy = os.path.join(tmp, "data.db")
+        shutil.copy(os.path.join(ROOT, "data.db"), db_copy)
+        runs = [run_once(db_copy) for _ in range(args.runs)]
+    results = {"startup.first_window_ms": statistics.median(r[0] for r in runs),
+               "startup.peak_rss_mb": max(r[1] for r in runs)}
+
+    if args.update:
+        baseline.save(BASELINE_FILE, results)
+        return 0
+    regressions = baseline.compare(results, baseline.load(BASELINE_FILE), args.tolerance)
+    if regressions:
+        print("startup got slower: " + ", ".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
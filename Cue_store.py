@@ -0,0 +1,285 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate, chain
+
+
+def parse_timestamp(stamp):
+    """ stamp is a string like 00:01:03.600 (or 00:01:03,600), return it with a millisecond unit value, None if broken """
+    stamp = stamp.strip()
+    try:
+        # fast path for the usual HH:MM:SS.mmm
+        if len(stamp) == 12 and stamp[2] == ":" and stamp[5] == ":":
+            return int(stamp[0:2]) * 3600000 + int(stamp[3:5]) * 60000 + int(stamp[6:8]) * 1000 + int(stamp[9:12])
+        hms, _, ms = stamp.replace(",", ".").partition(".")
+        parts = hms.split(":")
+        seconds = 0
+        for p in parts:
+            seconds = seconds * 60 + int(p)
+        return seconds * 1000 + int(ms.ljust(3, "0")[0:3])
+    except ValueError:
+        return None
+
+
+def iter_cues(lines):
+    """ read the lines (bytes) of a .vtt/.srt file once, yield (start, end, text) with text as utf-8 bytes """
+    start = end = None
+    text_lines = None
+    for each_line in lines:
+        if b"-->" in each_line:
+            if text_lines is not None:
+                yield start, end, b"\n".join(text_lines)
+            begin, _, finish = each_line.partition(b"-->")
+            finish = finish.split()
+            start = parse_timestamp(begin.decode("ascii", "replace"))
+            end = parse_timestamp(finish[0].decode("ascii", "replace")) if finish else None
+            text_lines = None if start is None or end is None else []
+        elif text_lines is not None:
+            each_line = each_line.rstrip(b"\r\n")
+            if each_line.strip() == b"":
+                yield start, end, b"\n".join(text_lines)
+                text_lines = None
+            else:
+                text_lines.append(each_line)
+    if text_lines is not None:
+        yield start, end, b"\n".join(text_lines)
+
+
+def _copy(typecode, view):
+    copied = array(typecode)
+    copied.frombytes(view.cast("B"))
+    return copied
+
+
+class cue_store:
+    """ parsed subtitle cues, sorted by start time
+
+    starts/ends are millisecond arrays, the text of cue i is text_buffer[text_offsets[i]:text_offsets[i + 1]]
+    stored as utf-8, so a big file costs a few flat buffers instead of one python string per line.
+    max_ends[i] is the biggest end time among cues 0..i, so the cues still active at a
+    position can be found by bisection even when cues overlap.
+    a store made by from_buffer reads all of them straight from the buffer, it is copied once cues are added.
+    """
+
+    def __init__(self, starts=None, ends=None, texts=None):
+        self.starts = array('i')
+        self.ends = array('i')
+        self.max_ends = array('i')
+        self.text_buffer = bytearray()
+        self.text_offsets = array('I', [0])
+        self._sorted = True
+        # the mmap (or other buffer) a read-only store is viewing
+        self._buffer = None
+        for start, end, text in zip(starts or [], ends or [], texts or []):
+            self.append(start, end, text)
+        self.sort()
+        # sequential cursor: the text stays valid for [_valid_from, _valid_until)
+        self._reset_cursor()
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _reset_cursor(self):
+        self._valid_from = 0
+        self._valid_until = -1
+        self._current = ""
+
+    def _thaw(self):
+        # turn the views of a read-only store into arrays of its own
+        if self._buffer is not None:
+            self.starts, self.ends, self.max_ends = (_copy('i', self.starts), _copy('i', self.ends),
+                                                     _copy('i', self.max_ends))
+            self.text_buffer, self.text_offsets = bytearray(self.text_buffer), _copy('I', self.text_offsets)
+            self._buffer = None
+
+    def append(self, start, end, text):
+        """ add one cue, text is str or utf-8 bytes """
+        self._thaw()
+        if isinstance(text, str):
+            text = text.encode("utf-8")
+        if self.starts and start < self.starts[-1]:
+            self._sorted = False
+        self.starts.append(start)
+        self.ends.append(end)
+        self.max_ends.append(max(self.max_ends[-1], end) if self.max_ends else end)
+        self.text_buffer += text
+        self.text_offsets.append(len(self.text_buffer))
+
+    def extend(self, other):
+        """ add the cues of another cue_store, used when a file is parsed in batches """
+        if not other:
+            return
+        if not self and other._buffer is not None:
+            # a read-only store can be shared as it is, the first append copies it anyway
+            self.starts, self.ends, self.max_ends = other.starts, other.ends, other.max_ends
+            self.text_buffer, self.text_offsets = other.text_buffer, other.text_offsets
+            self._buffer, self._sorted = other._buffer, other._sorted
+            self._reset_cursor()
+            return
+        self._thaw()
+        if self.starts and other.starts[0] < self.starts[-1]:
+            self._sorted = False
+        shift = len(self.text_buffer)
+        biggest = self.max_ends[-1] if self.max_ends else other.max_ends[0]
+        self.starts.extend(other.starts)
+        self.ends.extend(other.ends)
+        self.max_ends.extend(max(biggest, e) for e in other.max_ends)
+        self.text_buffer += other.text_buffer
+        self.text_offsets.extend(o + shift for o in other.text_offsets[1:])
+        self._sorted = self._sorted and other._sorted
+        self.sort()
+        self._reset_cursor()
+
+    def sort(self):
+        if self._sorted:
+            return
+        self._thaw()
+        order = sorted(range(len(self.starts)), key=self.starts.__getitem__)
+        starts, ends, texts = self.starts, self.ends, [self.text_bytes(i) for i in order]
+        self.starts, self.ends, self.max_ends = array('i'), array('i'), array('i')
+        self.text_buffer, self.text_offsets = bytearray(), array('I', [0])
+        self._sorted = True
+        for i, text in zip(order, texts):
+            self.append(starts[i], ends[i], text)
+
+    @classmethod
+    def from_lines(cls, lines):
+        """ build the store from the raw lines (str or bytes) of a .vtt file """
+        store = cls()
+        for start, end, text in iter_cues(l.encode("utf-8") if isinstance(l, str) else l for l in lines):
+            store.append(start, end, text)
+        store.sort()
+        return store
+
+    def write_to(self, f):
+        """ write the arrays and the text to the binary file f, from_buffer reads them back """
+        for part in (self.starts, self.ends, self.max_ends, self.text_offsets, self.text_buffer):
+            f.write(part)
+
+    @classmethod
+    def from_buffer(cls, buffer, offset, count):
+        """ a read-only store over what write_to wrote at offset of buffer, e.g. an mmap, nothing is copied """
+        view = memoryview(buffer)[offset:]
+        size = 4 * count
+        store = cls()
+        store.starts = view[0:size].cast('i')
+        store.ends = view[size:2 * size].cast('i')
+        store.max_ends = view[2 * size:3 * size].cast('i')
+        store.text_offsets = view[3 * size:4 * size + 4].cast('I')
+        store.text_buffer = view[4 * size + 4:]
+        store._buffer = buffer
+        return store
+
+    def with_times(self, starts, ends):
+        """ a store with the texts of this one and new times, starts (an array('i')) has to be in order """
+        store = cue_store()
+        store.starts, store.ends = starts, ends
+        store.max_ends = array('i', accumulate(ends, max))
+        store.text_buffer = bytearray(self.text_buffer)
+        store.text_offsets = _copy('I', memoryview(self.text_offsets))
+        return store
+
+    def text_bytes(self, i):
+        return bytes(self.text_buffer[self.text_offsets[i]:self.text_offsets[i + 1]])
+
+    def text(self, i):
+        return self.text_bytes(i).decode("utf-8", "replace")
+
+    def active(self, position):
+        """ return the indexes of the cues shown at position """
+        last = bisect_right(self.starts, position)
+        first = bisect_right(self.max_ends, position, 0, last)
+        return [i for i in range(first, last) if self.ends[i] > position]
+
+    def text_at(self, position):
+        """ return the subtitle text at position, forward playback usually hits the cursor """
+        if self._valid_from <= position < self._valid_until:
+            return self._current
+        indexes = self.active(position)
+        self._current = "\n".join(self.text(i) for i in indexes)
+        # the result only changes when the next cue starts or an active cue ends
+        last = bisect_right(self.starts, position)
+        until = self.starts[last] if last < len(self.starts) else float("inf")
+        for i in indexes:
+            until = min(until, self.ends[i])
+        self._valid_from = position
+        self._valid_until = until
+        return self._current
+
+    def index_at(self, position):
+        """ return the index of the first cue starting at or after position """
+        return bisect_left(self.starts, position)
+
+
+def _merge(points, values):
+    """ the sorted array points with the sorted values it lacks inserted, the runs between them are copied whole """
+    merged = array('i')
+    done = 0
+    for value in values:
+        i = bisect_left(points, value, done)
+        merged += points[done:i]
+        if i == len(points) or points[i] != value:
+            merged.append(value)
+        done = i
+    merged += points[done:]
+    return merged
+
+
+class track_index:
+    """ several cue_stores shown at once, e.g. two languages of the same video
+
+    the start and end times of all tracks are merged into one sorted array of change points,
+    between two neighbouring points no track changes, so one bisection finds the span of a
+    position and every tick inside it is answered by a single range check for all tracks.
+    """
+
+    def __init__(self, tracks=()):
+        self.tracks = tuple(tracks)
+        self._rebuild()
+
+    def _rebuild(self):
+        self.points = array('i', sorted(set(chain.from_iterable(chain(t.starts, t.ends) for t in self.tracks))))
+        self._lengths = [len(t) for t in self.tracks]
+        self._reset_cursor()
+
+    def _reset_cursor(self):
+        self._valid_from = 0
+        self._valid_until = -1
+        self._current = ("",) * len(self.tracks)
+
+    def set_tracks(self, tracks):
+        """ show these cue_stores, the points are only merged again when a track was replaced """
+        if len(tracks) != len(self.tracks) or any(a is not b for a, b in zip(tracks, self.tracks)):
+            self.tracks = tuple(tracks)
+            self._rebuild()
+
+    def add_batch(self, track, batch):
+        """ track was extended by batch, merge its times into the points """
+        for i, t in enumerate(self.tracks):
+            if t is track and batch:
+                self.points = _merge(self.points, sorted(set(chain(batch.starts, batch.ends))))
+                self._lengths[i] = len(t)
+                self._reset_cursor()
+
+    def texts_at(self, position):
+        """ the text of every track at position, "" for a track without a cue there """
+        if self._valid_from <= position < self._valid_until:
+            return self._current
+        if self._lengths != [len(t) for t in self.tracks]:
+            # a track grew without add_batch
+            self._rebuild()
+        if not self.points:
+            # nothing loaded yet, not worth a span
+            return self._current
+        i = bisect_right(self.points, position)
+        self._valid_from = self.points[i - 1] if i else float("-inf")
+        self._valid_until = self.points[i] if i < len(self.points) else float("inf")
+        self._current = tuple("\n".join(t.text(j) for j in t.active(position)) for t in self.tracks)
+        return self._current
+
+    def text_at(self, position):
+        """ the texts of the tracks that show something at position, one under the other """
+        return "\n".join(text for text in self.texts_at(position) if text)
+
+
+if __name__ == "__main__":
+    pass
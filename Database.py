@@ -0,0 +1,186 @@
+import sqlite3
+import threading
+import queue
+import atexit
+import os
+import sys
+import time
+import weakref
+import Profiler
+
+
+# the database lives next to the code, whatever the current directory is
+DB_PATH = os.path.join(os.path.split(os.path.realpath(__file__))[0], 'data.db')
+
+_connection = None
+# serializes the writes, reads never take it
+_lock = threading.RLock()
+# every thread reads through a connection of its own, WAL lets them go on while the writer commits
+_local = threading.local()
+# the readers that are open, a thread that ends drops its reader and the connection is closed
+_readers = weakref.WeakSet()
+# bumped by close, a thread whose connection is of an older generation opens a new one
+_generation = 0
+_queue = queue.Queue()
+_writer = None
+_STOP = object()
+# how many queued writes are committed in one transaction at most
+BATCH_SIZE = 256
+# and how many rows they may touch together, an executemany counts every row
+BATCH_ROWS = 20000
+
+
+def _open():
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=256)
+    # WAL lets readers go on while the writer commits, NORMAL syncs only at checkpoints
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def connection():
+    """ the one long-lived connection that writes, opened on first use """
+    global _connection
+    with _lock:
+        if _connection is None:
+            _connection = _open()
+        return _connection
+
+
+class _reader_connection:
+    """ the read connection of one thread, closed with it, sqlite3 connections can not be weakly referenced """
+
+    def __init__(self):
+        self.connection = _open()
+        self.generation = _generation
+        self.close = weakref.finalize(self, self.connection.close)
+
+
+def _reader():
+    reader = getattr(_local, "reader", None)
+    if reader is None or reader.generation != _generation:
+        # the writer connection first, so the database file and WAL mode exist
+        connection()
+        with _lock:
+            reader = _local.reader = _reader_connection()
+            _readers.add(reader)
+    return reader.connection
+
+
+def fetchall(sql, params=()):
+    return _reader().execute(sql, params).fetchall()
+
+
+def fetchone(sql, params=()):
+    return _reader().execute(sql, params).fetchone()
+
+
+def execute(sql, params=()):
+    """ run a write now and commit it, for the few places that must not be deferred """
+    with _lock:
+        conn = connection()
+        conn.execute(sql, params)
+        conn.commit()
+
+
+def submit(sql, params=()):
+    """ queue a write, the writer thread commits it together with the other pending ones """
+    _start_writer()
+    _queue.put([(sql, params, False)])
+
+
+def submit_many(sql, rows):
+    """ queue one statement for a list of rows, it is run with executemany """
+    _start_writer()
+    _queue.put([(sql, list(rows), True)])
+
+
+def submit_together(statements):
+    """ queue (sql, params) pairs that are committed in the same transaction, all of them or none """
+    _start_writer()
+    _queue.put([(sql, params, False) for sql, params in statements])
+
+
+def _start_writer():
+    global _writer
+    with _lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_write_behind, name="database writer", daemon=True)
+            _writer.start()
+
+
+def flush():
+    """ wait until every queued write is committed """
+    if _writer is not None:
+        _queue.join()
+
+
+def close():
+    global _connection, _writer, _generation
+    if _writer is not None:
+        _queue.put(_STOP)
+        _writer.join()
+        _writer = None
+    with _lock:
+        if _connection is not None:
+            _connection.close()
+            _connection = None
+        for reader in list(_readers):
+            reader.close()
+        _readers.clear()
+        # the next read of every thread opens a new one, e.g. after DB_PATH changed
+        _generation += 1
+
+
+def _rows(item):
+    if item is _STOP:
+        return 0
+    return sum(len(params) if many else 1 for sql, params, many in item)
+
+
+def _run(conn, item):
+    for sql, params, many in item:
+        (conn.executemany if many else conn.execute)(sql, params)
+
+
+def _write_behind():
+    while True:
+        batch = [_queue.get()]
+        rows = _rows(batch[0])
+        # a big executemany is committed alone, the lock is never held for more than about BATCH_ROWS rows
+        while len(batch) < BATCH_SIZE and rows < BATCH_ROWS:
+            try:
+                batch.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+            rows += _rows(batch[-1])
+        stop = _STOP in batch
+        writes = [item for item in batch if item is not _STOP]
+        with _lock:
+            conn = connection()
+            start = time.perf_counter()
+            try:
+                with conn:
+                    for item in writes:
+                        _run(conn, item)
+            except sqlite3.Error:
+                # one bad write must not lose the whole batch, redo them one by one
+                for item in writes:
+                    try:
+                        with conn:
+                            _run(conn, item)
+                    except sqlite3.Error as e:
+                        print("the database update failed: " + str(e) + "   " + item[0][0], file=sys.stderr)
+            if Profiler.ENABLED and writes:
+                Profiler.record("database_commit", time.perf_counter() - start)
+        for _ in batch:
+            _queue.task_done()
+        if stop:
+            return
+
+
+atexit.register(close)
+
+
+if __name__ == "__main__":
+    pass
@@ -1,11 +1,126 @@
-from PySide6.QtWidgets import QScrollArea, QPushButton
+from PySide6.QtWidgets import (QScrollArea, QPushButton, QWidget, QTableView, QHeaderView,
+                               QVBoxLayout, QHBoxLayout, QFileDialog, QLabel, QComboBox, QLineEdit)
 from PySide6.QtGui import QIcon, QPalette, QColor
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, Signal, QTimer
+from Cue_store import cue_store, parse_timestamp
+from Workers import subtitle_loader, journal_compactor
+import Subtitle_journal
+import Subtitle_parser
+import Resync
 import webbrowser
-import sqlite3
 import Functions
 import os
 
+
+class cue_model(QAbstractTableModel):
+    """ table of the cues of a cue_store, edits are kept in a sparse overlay until they are saved
+
+    the view only asks for the visible rows, so nothing is built per cue up front.
+    """
+    HEADERS = ("start", "end", "text")
+
+    def __init__(self, store=None):
+        super().__init__()
+        self.store = store if store is not None else cue_store()
+        # row -> (start, end, text), only for edited rows
+        self.overlay = {}
+        # every edit is appended here, the table is read-only without one
+        self.journal = None
+
+    def set_store(self, store):
+        self.beginResetModel()
+        self.store = store
+        self.overlay = {}
+        self.journal = None
+        self.endResetModel()
+
+    def append_cues(self, batch):
+        """ grow the table while the file is still being parsed """
+        if not batch:
+            return
+        first = len(self.store)
+        if first and min(batch.starts) < self.store.starts[-1]:
+            # extend sorts the cues of the batch in between the rows that are shown already
+            self.beginResetModel()
+            self.store.extend(batch)
+            self.endResetModel()
+            return
+        self.beginInsertRows(QModelIndex(), first, first + len(batch) - 1)
+        self.store.extend(batch)
+        self.endInsertRows()
+
+    def cue(self, row):
+        if row in self.overlay:
+            return self.overlay[row]
+        return self.store.starts[row], self.store.ends[row], self.store.text(row)
+
+    def iter_cues(self):
+        """ the cues as they are now, edits made while it is iterated in another thread are not seen """
+        store, overlay = self.store, dict(self.overlay)
+        return (overlay[row] if row in overlay else (store.starts[row], store.ends[row], store.text(row))
+                for row in range(len(store)))
+
+    def retime(self, function):
+        """ move every cue through function, see Resync, nothing is journaled, the caller saves the file """
+        self.beginResetModel()
+        self.store = Resync.retime(self.store, function)
+        overlay = {}
+        for row, (start, end, text) in self.overlay.items():
+            start, end = (int(t) for t in Resync.apply(function, (start, end)))
+            overlay[row] = (start, max(start, end), text)
+        self.overlay = overlay
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.store)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        return self.HEADERS[section] if orientation == Qt.Horizontal else section + 1
+
+    def flags(self, index):
+        if self.journal is None:
+            return super().flags(index)
+        return super().flags(index) | Qt.ItemIsEditable
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.EditRole):
+            return None
+        value = self.cue(index.row())[index.column()]
+        if index.column() < 2:
+            return Functions.change_position_into_time(value)
+        return value
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.EditRole:
+            return False
+        cue = list(self.cue(index.row()))
+        if index.column() < 2:
+            position = parse_timestamp(value)
+            if position is None:
+                return False
+            # cues stay in start order, so rows keep their numbers when the file is read again
+            row = index.row()
+            if index.column() == 0 and ((row > 0 and position < self.cue(row - 1)[0])
+                                        or (row + 1 < len(self.store) and position > self.cue(row + 1)[0])):
+                return False
+            cue[index.column()] = position
+        else:
+            # an empty line ends a cue in the file, so it can not be part of the text
+            cue[2] = "\n".join(line for line in value.splitlines() if line.strip())
+        self.overlay[index.row()] = tuple(cue)
+        self.journal.record(index.row(), *cue)
+        self.dataChanged.emit(index, index)
+        return True
+
+
 class editor_window(QScrollArea):
+    send_saved_signal_to_mainwindow = Signal(str)
+
     def __init__(self):
         super().__init__()
 
@@ -23,38 +138,187 @@ class editor_window(QScrollArea):
         p.setColor(QPalette.Window, QColor(255, 255, 255))
         self.setPalette(p)
 
+        # current subtitle file
+        self.subtitle_filename = ""
+        self._loader = None
+        # edits go to the journal at once and into the file every half minute
+        self.journal = None
+        self._compactor = None
+        self._compact_timer = QTimer(self)
+        self._compact_timer.setInterval(30000)
+        self._compact_timer.timeout.connect(lambda: self.compact_journal(False))
+
         # buttons
-        self.open = QPushButton(self)
+        self.open = QPushButton()
         self.open.setText("open")
-        self.open.move(10, 0)
-        # self.open.clicked.connect(self.open_subtitle_file)
+        self.open.clicked.connect(self.open_subtitle_file)
         # save
-        self.save = QPushButton(self)
+        self.save = QPushButton()
         self.save.setText("save")
-        self.save.move(100, 0)
+        self.save.setEnabled(False)
+        self.save.clicked.connect(self.save_subtitle_file)
         # help
-        self.help = QPushButton(self)
+        self.help = QPushButton()
         self.help.setText("help")
-        self.help.move(self.width() - 100, 0)
         self.help.clicked.connect(self.help_manual)
+        self.file_label = QLabel()
+        # resync, every cue is moved at once and the file is saved
+        self.resync_mode = QComboBox()
+        self.resync_mode.addItems(Resync.MODES)
+        self.resync_mode.currentTextChanged.connect(self.resync_mode_changed)
+        self.resync_value = QLineEdit()
+        self.resync_value.returnPressed.connect(self.resync)
+        self.resync_button = QPushButton()
+        self.resync_button.setText("resync")
+        self.resync_button.setEnabled(False)
+        self.resync_button.clicked.connect(self.resync)
+        self.resync_mode_changed(self.resync_mode.currentText())
+
+        # cue table, fixed row heights so the view never measures rows it does not show
+        self.model = cue_model()
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setColumnWidth(0, 110)
+        self.table.setColumnWidth(1, 110)
+        self.table.setWordWrap(False)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.open)
+        buttons.addWidget(self.save)
+        buttons.addWidget(self.file_label, 1)
+        buttons.addWidget(self.help)
+        resync = QHBoxLayout()
+        resync.addWidget(self.resync_mode)
+        resync.addWidget(self.resync_value, 1)
+        resync.addWidget(self.resync_button)
+        container = QWidget()
+        layout = QVBoxLayout(container)
+        layout.addLayout(buttons)
+        layout.addLayout(resync)
+        layout.addWidget(self.table)
+        self.setWidget(container)
+        self.setWidgetResizable(True)
+
+    def open_subtitle_file(self):
+        filename, _ = QFileDialog.getOpenFileName(self, filter="subtitle (*.vtt *.srt *.ass *.ssa)")
+        if filename != '':
+            self.load_subtitle_file(filename)
+
+    def load_subtitle_file(self, filename):
+        """ show the cues of filename, they are parsed in the background and appended as they come """
+        self.close_journal()
+        if self._loader is not None:
+            self._loader.requestInterruption()
+            self._loader.wait()
+        self.subtitle_filename = filename
+        self.file_label.setText(filename)
+        self.model.set_store(cue_store())
+        # saving waits for the last batch, finished is queued after it
+        self.save.setEnabled(False)
+        self.resync_button.setEnabled(False)
+        self._loader = subtitle_loader(filename, self)
+        self._loader.cues_parsed.connect(self.add_cues)
+        self._loader.finished.connect(self.loading_finished)
+        self._loader.start()
+
+    def add_cues(self, batch):
+        if self.sender() is self._loader:
+            self.model.append_cues(batch)
+
+    def loading_finished(self):
+        if self.sender() is not self._loader or not os.path.isfile(self.subtitle_filename):
+            return
+        if not Subtitle_parser.writable(self.subtitle_filename):
+            self.file_label.setText(self.subtitle_filename + "   read-only, this format is not written back")
+            return
+        try:
+            self.journal = Subtitle_journal.edit_journal(self.subtitle_filename)
+        except OSError as e:
+            print(self.subtitle_filename + "   can not be edited: " + str(e))
+            return
+        self.model.journal = self.journal
+        self.model.overlay.update(self.journal.recovered)
+        self.save.setEnabled(True)
+        self.resync_button.setEnabled(True)
+        self._compact_timer.start()
+
+    def save_subtitle_file(self):
+        self.compact_journal(True)
+
+    def compact_journal(self, always):
+        """ write the edits into the subtitle file in the background, the journal keeps them until it is done """
+        if self.journal is None or (self._compactor is not None and self._compactor.isRunning()):
+            return
+        if not always and self.journal.pending == 0:
+            return
+        self._compactor = journal_compactor(self.journal, self.model.iter_cues(), self.journal.pending, self)
+        self._compactor.compacted.connect(self.journal_compacted)
+        self._compactor.start()
+
+    def resync_mode_changed(self, mode):
+        self.resync_value.setPlaceholderText({"shift": "-1500 or +00:00:02.250",
+                                              "stretch": "1.0427 or 25/23.976 (subtitle fps/video fps)",
+                                              "anchors": "cue=time, e.g. 1=00:00:12.300, 840=01:31:02.000"}[mode])
+
+    def resync(self):
+        if self.journal is None:
+            return
+        try:
+            function = Resync.transform(self.resync_mode.currentText(), self.resync_value.text(),
+                                        lambda row: self.model.cue(row)[0])
+        except ValueError as e:
+            self.file_label.setText(self.subtitle_filename + "   " + str(e))
+            return
+        # a journal entry replayed onto the file with the other times would put its cue out of step,
+        # so the edits are saved before the retime and the retimed cues are saved with an empty journal
+        if self._compactor is not None:
+            self._compactor.wait()
+            # what it saved is saved again below, its signal must not drop entries a second time
+            self._compactor = None
+        if self.journal.pending and not self._save_now():
+            return
+        self.model.retime(function)
+        if self._save_now():
+            self.file_label.setText(self.subtitle_filename + "   saved")
+            self.send_saved_signal_to_mainwindow.emit(self.subtitle_filename)
+
+    def _save_now(self):
+        """ write the cues into the subtitle file on this thread, False if it can not be written """
+        try:
+            self.journal.compact(self.model.iter_cues())
+        except OSError as e:
+            self.file_label.setText(self.subtitle_filename + "   can not be saved: " + str(e))
+            return False
+        self.journal.compacted(self.journal.pending)
+        return True
+
+    def journal_compacted(self, count):
+        if self.sender() is not self._compactor or self._compactor.journal is not self.journal:
+            return
+        self.journal.compacted(count)
+        self.file_label.setText(self.subtitle_filename + "   saved")
+        self.send_saved_signal_to_mainwindow.emit(self.subtitle_filename)
+
+    def close_journal(self):
+        """ stop journaling the current file, edits that are not in the file yet stay in its journal """
+        self._compact_timer.stop()
+        if self._compactor is not None:
+            self._compactor.wait()
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
 
     def closeEvent(self, event) -> None:
-        # save mainwindow's location to database
-        sql = f'''UPDATE EDITOR_WINDOW SET ID = 1, X = {self.x()}, Y = {self.y()}, Width = {self.width()}, Height = {self.height()};'''
-        Functions.sqlite_update(sql)
+        # save the window's location to database
+        Functions.save_window_location(self, "EDITOR_WINDOW")
         print("The position of the editor window is saved!")
         return super().closeEvent(event)
 
 
     def load_location(self):
-        conn = sqlite3.connect('data.db')
-        c = conn.cursor()
-        c.execute("SELECT X, Y, Width, Height from EDITOR_WINDOW")
-        data = c.fetchall()
-        self.move(data[0][0], data[0][1])
-        self.resize(data[0][2], data[0][3])
-        conn.commit()
-        conn.close()
+        Functions.load_window_location(self, "EDITOR_WINDOW")
 
 
     @staticmethod
@@ -62,4 +326,4 @@ class editor_window(QScrollArea):
         webbrowser.open(".\\Icon\\default.svg")
 
 if __name__ == "__main__":
-    pass
\ No newline at end of file
+    pass
@@ -1,63 +1,103 @@
-import sqlite3
+import Database
+import Profiler
+import os
+from Cue_store import cue_store, track_index, parse_timestamp
+
+
+# the video formats the player opens, a subtitle sits next to the video as <name>.vtt
+FORMAT_LIST = ['.flv', '.mp4', '.ts']
+# the subtitle formats Subtitle_parser reads, in the order they are preferred
+SUBTITLE_FORMATS = ['.vtt', '.srt', '.ass', '.ssa']
 
 
 def change_position_into_time(position):
     return (str(int(int(int(position // 1000) // 60) // 60)).zfill(2)
             + ":" + str(int(int(position // 1000) // 60) - int(int(int(position // 1000) // 60) // 60) * 60).zfill(2)
-            + ":" + str(int(position // 1000) - int(int(position // 1000) // 60) * 60 - int(int(int(position // 1000) // 60) // 60) * 3600).zfill(2)
+            + ":" + str(int(position // 1000) - int(int(position // 1000) // 60) * 60).zfill(2)
             + "." + str(int(position % 1000)).zfill(3))
 
 
 def change_time_into_position(time):
-    """ time is a string format like 00:01:03.600, return it with a millisecond unit value """
-    try:
-        return int(time[0:2]) * 60 * 60 * 1000 + int(time[3:5]) * 60 * 1000 + int(time[6:8]) * 1000 + int(time[9:12])
-    except:
+    """ time is a string format like 00:01:03.600, 0:01:03,600 also works, return it with a millisecond unit value """
+    position = parse_timestamp(time)
+    if position is None:
         print(time + "   this row has some format problems in the subtitle file!")
+    return position
 
 
+@Profiler.timed("subtitle_lookup")
 def get_subtitle(position, subtitle_data):
-        subtitle_content = ""
-        write_or_not = False
+    """ subtitle_data is a cue_store, a track_index of several, or the raw lines of a .vtt file for old callers """
+    try:
+        if not isinstance(subtitle_data, (cue_store, track_index)):
+            subtitle_data = cue_store.from_lines(subtitle_data)
+        return subtitle_data.text_at(int(position))
+    except (TypeError, ValueError):
+        return "the subtitle fails"
+
+
+def subtitle_file_for(filename, format_list):
+    """ the .vtt file next to the video with the same name, None if the video format is not supported """
+    for f in format_list:
+        if filename.endswith(f):
+            return filename[0:-len(f)] + ".vtt"
+    return None
+
+
+def subtitle_index(names):
+    """ map the name stems of a directory listing to its subtitle files, movie.en.srt is found for movie and movie.en """
+    index = {}
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        if ext.lower() not in SUBTITLE_FORMATS:
+            continue
+        while stem:
+            index.setdefault(stem, []).append(name)
+            stem = stem.rpartition(".")[0]
+    return index
+
+
+def subtitle_files_for(filename, format_list, index=None):
+    """ every subtitle file next to the video, <name>.vtt first, [] if the video format is not supported
+
+    index is the subtitle_index of the directory, it is listed when it is not given.
+    """
+    if subtitle_file_for(filename, format_list) is None:
+        return []
+    directory, name = os.path.split(filename)
+    if index is None:
         try:
-            for each_line in subtitle_data:
-                if "-->" in each_line:
-                    if write_or_not:
-                        break
-                else:
-                    if write_or_not:
-                        subtitle_content = subtitle_content + each_line
-                    continue
-                try:
-                    if (int(position) >= int(each_line[0:2]) * 60 * 60 * 1000 + int(each_line[3:5]) * 60 * 1000 + int(each_line[6:8]) * 1000 + int(each_line[9:12])
-                        or int(position) == int(each_line[0:2]) * 60 * 60 * 1000 + int(each_line[3:5]) * 60 * 1000 + int(each_line[6:8]) * 1000 + int(each_line[9:12])) \
-                            and int(position) < int(each_line[17:19]) * 60 * 60 * 1000 + int(each_line[20:22]) * 60 * 1000 + int(each_line[23:25]) * 1000 + int(each_line[26:29]):
-                        write_or_not = True
-                        continue
-                    else:
-                        continue
-                except:
-                    pass
-        except:
-            subtitle_content = "the subtitle fails"
-        return subtitle_content
-
-
-def sqlite_update(sql):
-    conn = sqlite3.connect('data.db')
-    c = conn.cursor()
-    c.execute(sql)
-    print ("update the database successfully!")
-    conn.commit()
-    conn.close()
-
-def sqlite_fetch(sql):
-    conn = sqlite3.connect('data.db')
-    c = conn.cursor()
-    c.execute(sql)
-    print ("the data was collected successfully!")
-    conn.commit()
-    conn.close()   
+            index = subtitle_index(os.listdir(directory or "."))
+        except OSError:
+            return []
+    found = index.get(os.path.splitext(name)[0], [])
+    found = sorted(found, key=lambda n: (SUBTITLE_FORMATS.index(os.path.splitext(n)[1].lower()), len(n), n))
+    return [os.path.join(directory, n) for n in found]
+
+
+@Profiler.timed("sqlite_update")
+def sqlite_update(sql, params=()):
+    """ queue a parameterized write, it is committed in a batch by the database writer thread """
+    Database.submit(sql, params)
+
+
+@Profiler.timed("sqlite_fetch")
+def sqlite_fetch(sql, params=()):
+    """ return all rows of a parameterized query """
+    return Database.fetchall(sql, params)
+
+
+def load_window_location(window, table):
+    """ move and resize window to the geometry saved in table """
+    data = sqlite_fetch(f"SELECT X, Y, Width, Height FROM {table}")
+    if data:
+        window.move(data[0][0], data[0][1])
+        window.resize(data[0][2], data[0][3])
+
+
+def save_window_location(window, table):
+    sql = f"UPDATE {table} SET ID = 1, X = ?, Y = ?, Width = ?, Height = ?;"
+    sqlite_update(sql, (window.x(), window.y(), window.width(), window.height()))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,122 @@
+import subprocess
+from array import array
+from bisect import bisect_left
+from fractions import Fraction
+import Database
+import Media_probe
+
+
+def create_table():
+    # TIMES are ms from the start of the file, like the positions of the player
+    Database.execute('''CREATE TABLE IF NOT EXISTS KEYFRAMES
+                (PATH  TEXT PRIMARY KEY,
+                    SIZE  INT  NOT NULL,
+                    MTIME INT  NOT NULL,
+                    TIMES BLOB NOT NULL);''')
+
+
+def cached(path):
+    """ the keyframe times (ms) of path from data.db, None if they are unknown or the file changed """
+    size, mtime = Media_probe.file_identity(path)
+    row = Database.fetchone("SELECT TIMES FROM KEYFRAMES WHERE PATH = ? AND SIZE = ? AND MTIME = ?;",
+                            (path, size, mtime))
+    if row is None:
+        return None
+    times = array('i')
+    times.frombytes(row[0])
+    return times
+
+
+def store(path, times):
+    size, mtime = Media_probe.file_identity(path)
+    Database.submit("INSERT OR REPLACE INTO KEYFRAMES (PATH, SIZE, MTIME, TIMES) VALUES (?, ?, ?, ?);",
+                    (path, size, mtime, times.tobytes()))
+
+
+def _start_time(path):
+    """ the start time (s) of the file, a .ts file often starts at 1.4 s and the player counts from there """
+    result = subprocess.run([Media_probe.ffprobe_binary(), "-v", "error", "-show_entries", "format=start_time",
+                             "-of", "csv=p=0", path], capture_output=True, text=True)
+    try:
+        return float(result.stdout.strip())
+    except ValueError:
+        return 0.0
+
+
+def _ffprobe_keyframes(lines, start=0.0):
+    # ffprobe -show_entries packet=pts_time,flags -of csv=p=0 writes lines like 12.345000,K__
+    for line in lines:
+        pts, _, flags = line.strip().partition(",")
+        if flags.startswith("K") and pts not in ("", "N/A"):
+            yield round((float(pts) - start) * 1000)
+
+
+def _framecrc_keyframes(lines):
+    # ffmpeg -c copy -f framecrc writes "#tb 0: 1/12800" and then one line per packet,
+    # stream, dts, pts, duration, size, crc, and ", F=0x.." only when the packet is not a keyframe.
+    # without -copyts ffmpeg has taken the start time of the file off the timestamps already
+    time_base = None
+    for line in lines:
+        if line.startswith("#tb 0:"):
+            time_base = Fraction(line.split(":", 1)[1].strip())
+        elif not line.startswith("#") and "F=" not in line and time_base is not None:
+            fields = line.split(",")
+            if len(fields) >= 3:
+                yield round(int(fields[2]) * time_base * 1000)
+
+
+def build(path, cancelled=None):
+    """ read the video packets of path without decoding them, return its sorted keyframe times (ms)
+
+    the times count from the start of the file like the positions of the player, not from 0 of the
+    stream. None if neither ffprobe nor ffmpeg is found or cancelled() turned true on the way.
+    """
+    if Media_probe.ffprobe_binary():
+        command = [Media_probe.ffprobe_binary(), "-v", "error", "-select_streams", "v:0",
+                   "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", path]
+        start = _start_time(path)
+        parse = lambda lines: _ffprobe_keyframes(lines, start)
+    elif Media_probe.ffmpeg_binary():
+        command = [Media_probe.ffmpeg_binary(), "-v", "error", "-i", path, "-map", "0:v:0", "-c", "copy",
+                   "-f", "framecrc", "-"]
+        parse = _framecrc_keyframes
+    else:
+        return None
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    times = array('i')
+    try:
+        for time in parse(process.stdout):
+            if cancelled is not None and cancelled():
+                return None
+            times.append(time)
+    finally:
+        process.kill()
+        process.wait()
+    # packets come in decoding order, B-frame streams are not sorted by pts
+    return array('i', sorted(times))
+
+
+def load(path, cancelled=None):
+    """ the keyframe times of path, built once and then read from data.db """
+    times = cached(path)
+    if times is None:
+        times = build(path, cancelled)
+        if times is not None:
+            store(path, times)
+    return times
+
+
+def snap(times, position):
+    """ the keyframe closest to position, a seek there does not have to decode a whole GOP """
+    if not times:
+        return position
+    i = bisect_left(times, position)
+    if i == 0:
+        return times[0]
+    if i == len(times) or position - times[i - 1] <= times[i] - position:
+        return times[i - 1]
+    return times[i]
+
+
+if __name__ == "__main__":
+    pass
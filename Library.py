@@ -0,0 +1,109 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import Database
+import Functions
+import Media_probe
+
+
+def create_table():
+    Database.execute('''CREATE TABLE IF NOT EXISTS LIBRARY
+                (PATH      TEXT PRIMARY KEY,
+                    DIRECTORY TEXT NOT NULL,
+                    SIZE      INT  NOT NULL,
+                    MTIME     INT  NOT NULL,
+                    DURATION  REAL,
+                    SUBTITLE  TEXT NOT NULL);''')
+    Database.execute('''CREATE INDEX IF NOT EXISTS LIBRARY_DIRECTORY ON LIBRARY (DIRECTORY);''')
+    Database.execute('''CREATE INDEX IF NOT EXISTS LIBRARY_DURATION ON LIBRARY (DURATION);''')
+    Database.execute('''CREATE TABLE IF NOT EXISTS LIBRARY_ROOT
+                (PATH TEXT PRIMARY KEY);''')
+
+
+def roots():
+    return [row[0] for row in Functions.sqlite_fetch("SELECT PATH FROM LIBRARY_ROOT ORDER BY PATH")]
+
+
+def _prefix_range(directory):
+    # every path below directory sorts between these two, so the primary key index answers the query
+    directory = os.path.join(directory, "")
+    return directory, directory[:-1] + chr(ord(directory[-1]) + 1)
+
+
+def _scan_dir(directory, format_list):
+    """ list one directory, return (sub directories, [(path, size, mtime, subtitle)]) """
+    subdirs, videos = [], []
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return subdirs, videos
+    # the sidecars are looked up in the listing, no extra stat per video
+    index = Functions.subtitle_index(entry.name for entry in entries)
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+                continue
+            if Functions.subtitle_file_for(entry.name, format_list) is None:
+                continue
+            st = entry.stat()
+        except OSError:
+            continue
+        subtitles = Functions.subtitle_files_for(entry.path, format_list, index)
+        videos.append((entry.path, st.st_size, st.st_mtime_ns, subtitles[0] if subtitles else ""))
+    return subdirs, videos
+
+
+def scan(root, format_list=Functions.FORMAT_LIST, progress=None, probe=True, workers=8, cancelled=None):
+    """ index the videos below root, only new or changed files are probed and written
+
+    progress(directories, videos, changed) is called while the tree is walked.
+    return a dict with the counts of seen, changed and removed videos, cancelled() stops it early.
+    """
+    root = os.path.abspath(root)
+    low, high = _prefix_range(root)
+    known = {row[0]: row[1:] for row in Functions.sqlite_fetch(
+        "SELECT PATH, SIZE, MTIME, SUBTITLE FROM LIBRARY WHERE PATH >= ? AND PATH < ?", (low, high))}
+    Functions.sqlite_update("INSERT OR IGNORE INTO LIBRARY_ROOT (PATH) VALUES (?);", (root,))
+
+    seen = set()
+    changed = []
+    directories = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="library") as pool:
+        pending = {pool.submit(_scan_dir, root, format_list)}
+        while pending:
+            if cancelled is not None and cancelled():
+                # a walk that did not reach every folder must not remove the videos it missed
+                pool.shutdown(cancel_futures=True)
+                return {"directories": directories, "videos": len(seen), "changed": 0, "removed": 0}
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                subdirs, videos = future.result()
+                directories += 1
+                for d in subdirs:
+                    pending.add(pool.submit(_scan_dir, d, format_list))
+                for path, size, mtime, subtitle in videos:
+                    seen.add(path)
+                    if known.get(path) != (size, mtime, subtitle):
+                        changed.append((path, size, mtime, subtitle))
+            if progress is not None and (directories % 64 == 0 or not pending):
+                progress(directories, len(seen), len(changed))
+
+        # probing runs ffprobe, so only the changed files pay for it, also in parallel
+        durations = pool.map(lambda v: (Media_probe.probe(v[0]) or {}).get("duration") if probe else None, changed)
+        for (path, size, mtime, subtitle), duration in zip(changed, durations):
+            if cancelled is not None and cancelled():
+                # the rest is probed and written on the next scan
+                pool.shutdown(cancel_futures=True)
+                break
+            Functions.sqlite_update('''INSERT OR REPLACE INTO LIBRARY (PATH, DIRECTORY, SIZE, MTIME, DURATION, SUBTITLE)
+                                    VALUES (?, ?, ?, ?, ?, ?);''',
+                                    (path, os.path.dirname(path), size, mtime, duration, subtitle))
+
+    removed = [path for path in known if path not in seen]
+    for path in removed:
+        Functions.sqlite_update("DELETE FROM LIBRARY WHERE PATH = ?;", (path,))
+    return {"directories": directories, "videos": len(seen), "changed": len(changed), "removed": len(removed)}
+
+
+if __name__ == "__main__":
+    pass
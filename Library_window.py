@@ -0,0 +1,134 @@
+from PySide6.QtWidgets import (QWidget, QPushButton, QLabel, QProgressBar, QListWidget, QListWidgetItem,
+                               QLineEdit, QVBoxLayout, QHBoxLayout, QFileDialog)
+from PySide6.QtGui import QIcon
+from PySide6.QtCore import Qt, Signal
+from Workers import library_scanner, subtitle_searcher
+import Library
+import Subtitle_search
+import Functions
+import os
+
+
+class library_window(QWidget):
+    open_requested = Signal(str, int)  # path, position in ms
+
+    def __init__(self):
+        super().__init__()
+
+        # set title for the window
+        self.setWindowTitle("library")
+        self.setWindowIcon(QIcon('.\\Icon\\player.png'))
+        self.resize(600, 500)
+
+        # buttons
+        self.add = QPushButton("add folder")
+        self.add.clicked.connect(self.add_folder)
+        self.rescan = QPushButton("rescan")
+        self.rescan.clicked.connect(lambda: self.start_scan(Library.roots()))
+        self.progress = QProgressBar()
+        self.progress.setRange(0, 0)
+        self.progress.hide()
+        self.status = QLabel()
+        self.folders = QListWidget()
+        for root in Library.roots():
+            self.folders.addItem(root)
+        self._scanner = None
+        self._searcher = None
+        # full-text search in the subtitles of the library
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("search the subtitles of the library")
+        self.search_box.returnPressed.connect(self.search)
+        self.results = QListWidget()
+        self.results.itemActivated.connect(self.open_result)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.add)
+        buttons.addWidget(self.rescan)
+        buttons.addWidget(self.progress)
+        layout = QVBoxLayout()
+        layout.addLayout(buttons)
+        layout.addWidget(self.status)
+        layout.addWidget(self.folders, 1)
+        layout.addWidget(self.search_box)
+        layout.addWidget(self.results, 3)
+        self.setLayout(layout)
+
+    def search(self):
+        phrase = self.search_box.text().strip()
+        if len(phrase) < Subtitle_search.MIN_PHRASE:
+            self.status.setText(f"type at least {Subtitle_search.MIN_PHRASE} characters to search")
+            return
+        self._stop_searcher()
+        self.status.setText("searching...")
+        self._searcher = subtitle_searcher(phrase, self)
+        self._searcher.found.connect(self.show_results)
+        self._searcher.start()
+
+    def show_results(self, phrase, rows):
+        if self.sender() is not self._searcher:
+            return
+        self.results.clear()
+        for video, start, end, text in rows:
+            item = QListWidgetItem(f"{os.path.basename(video)}   {Functions.change_position_into_time(start)}   "
+                                   + text.replace("\n", " "))
+            item.setData(Qt.UserRole, (video, start))
+            self.results.addItem(item)
+        self.status.setText(f"{len(rows)} cues with \"{phrase}\"" if rows else "nothing found")
+
+    def _stop_searcher(self):
+        # one query of the index takes milliseconds, it is not interrupted but waited for
+        if self._searcher is not None:
+            self._searcher.wait()
+            self._searcher = None
+
+    def open_result(self, item):
+        video, start = item.data(Qt.UserRole)
+        self.open_requested.emit(video, start)
+
+    def add_folder(self):
+        folder = QFileDialog.getExistingDirectory(self)
+        if folder:
+            if not self.folders.findItems(folder, Qt.MatchExactly):
+                self.folders.addItem(folder)
+            self.start_scan([folder])
+
+    def start_scan(self, roots):
+        if self._scanner is not None and self._scanner.isRunning():
+            return
+        self._scanner = library_scanner(roots, self)
+        self._scanner.progress.connect(self.show_progress)
+        self._scanner.indexing.connect(self.show_indexing)
+        self._scanner.scanned.connect(self.scan_finished)
+        self.progress.show()
+        self.add.setEnabled(False)
+        self.rescan.setEnabled(False)
+        self._scanner.start()
+
+    def show_progress(self, directories, videos, changed):
+        self.status.setText(f"{directories} folders, {videos} videos, {changed} new or changed")
+
+    def show_indexing(self, checked, subtitles, reindexed):
+        self.status.setText(f"indexing subtitles {checked}/{subtitles}, {reindexed} new or changed")
+
+    def scan_finished(self, summary):
+        self.progress.hide()
+        self.add.setEnabled(True)
+        self.rescan.setEnabled(True)
+        if summary:
+            self.status.setText(f"{summary['videos']} videos, {summary['changed']} new or changed, "
+                                f"{summary['removed']} removed")
+
+    def shutdown(self):
+        """ stop a running scan and search and wait for them, they use data.db until they return """
+        if self._scanner is not None:
+            self._scanner.requestInterruption()
+            self._scanner.wait()
+        self._stop_searcher()
+
+    def closeEvent(self, event) -> None:
+        self.shutdown()
+        return super().closeEvent(event)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,109 @@
+import json
+import os
+import shutil
+import subprocess
+import Database
+import Profiler
+
+
+def create_table():
+    Database.execute('''CREATE TABLE IF NOT EXISTS MEDIA_INFO
+                (PATH     TEXT PRIMARY KEY,
+                    SIZE     INT  NOT NULL,
+                    MTIME    INT  NOT NULL,
+                    DURATION REAL,
+                    WIDTH    INT,
+                    HEIGHT   INT,
+                    CODEC    TEXT,
+                    FPS      REAL);''')
+
+
+def ffprobe_binary():
+    return shutil.which("ffprobe")
+
+
+def ffmpeg_binary():
+    """ ffmpeg from PATH, or the one shipped with moviepy's imageio_ffmpeg """
+    binary = shutil.which("ffmpeg")
+    if binary is None:
+        try:
+            import imageio_ffmpeg
+            binary = imageio_ffmpeg.get_ffmpeg_exe()
+        except (ImportError, RuntimeError):
+            pass
+    return binary
+
+
+def file_identity(path):
+    """ (size, mtime in ns) of the file, a cached result is only valid while they stay the same """
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+def cached(path):
+    """ return the cached info of path, None if it is unknown or the file changed """
+    size, mtime = file_identity(path)
+    row = Database.fetchone('''SELECT DURATION, WIDTH, HEIGHT, CODEC, FPS FROM MEDIA_INFO
+                            WHERE PATH = ? AND SIZE = ? AND MTIME = ?;''', (path, size, mtime))
+    if row is None:
+        return None
+    return dict(zip(("duration", "width", "height", "codec", "fps"), row))
+
+
+def store(path, info):
+    size, mtime = file_identity(path)
+    Database.submit('''INSERT OR REPLACE INTO MEDIA_INFO (PATH, SIZE, MTIME, DURATION, WIDTH, HEIGHT, CODEC, FPS)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?);''',
+                    (path, size, mtime, info["duration"], info["width"], info["height"], info["codec"], info["fps"]))
+
+
+def _fraction(text):
+    # ffprobe writes frame rates like 30000/1001
+    num, _, den = (text or "0").partition("/")
+    try:
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def run_ffprobe(path):
+    out = subprocess.run([ffprobe_binary(), "-v", "error", "-print_format", "json",
+                          "-show_format", "-show_streams", path],
+                         capture_output=True, check=True).stdout
+    data = json.loads(out)
+    video = next((s for s in data.get("streams", []) if s.get("codec_type") == "video"), {})
+    duration = data.get("format", {}).get("duration") or video.get("duration")
+    return {"duration": float(duration) if duration else None,
+            "width": video.get("width"),
+            "height": video.get("height"),
+            "codec": video.get("codec_name"),
+            "fps": _fraction(video.get("avg_frame_rate"))}
+
+
+def run_moviepy(path):
+    # only used when there is no ffprobe, moviepy is heavy so it is imported here
+    from moviepy.editor import VideoFileClip
+    clip = VideoFileClip(path)
+    try:
+        return {"duration": clip.duration, "width": clip.size[0], "height": clip.size[1],
+                "codec": None, "fps": clip.fps}
+    finally:
+        clip.close()
+
+
+@Profiler.timed("media_probe")
+def probe(path):
+    """ return {duration, width, height, codec, fps} of the media file, None if it can not be read """
+    try:
+        info = cached(path)
+        if info is None:
+            info = run_ffprobe(path) if ffprobe_binary() else run_moviepy(path)
+            store(path, info)
+        return info
+    except (OSError, ValueError, KeyError, ImportError, subprocess.CalledProcessError) as e:
+        print(path + "   can not be probed: " + str(e))
+        return None
+
+
+if __name__ == "__main__":
+    pass
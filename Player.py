@@ -1,22 +1,31 @@
 from PySide6.QtWidgets import (QWidget, QHBoxLayout, QVBoxLayout,
                                 QPushButton, QStyle, QSlider, QCheckBox, QToolButton,
-                                QSpinBox, QSizePolicy, QLabel, QFileDialog)                       
-from PySide6.QtGui import QIcon, QPalette, QColor, QTextOption
+                                QSpinBox, QSizePolicy, QLabel, QFileDialog, QMenu)                       
+from PySide6.QtGui import QIcon, QPalette, QColor, QTextOption, QShortcut, QKeySequence
 from PySide6.QtMultimedia import QMediaPlayer, QAudioOutput
 from PySide6.QtMultimediaWidgets import QVideoWidget
-from PySide6.QtCore import Qt, QUrl, Slot
+from PySide6.QtCore import Qt, QUrl, Slot, QTimer, QEvent
 from Subtitle import subtitle
-from Editor_window import editor_window
-from Timeline_window import timeline_window
-import sqlite3
-import os, sys
-from moviepy.editor import *
+import os, sys, time
 import Functions
+import Profiler
+import Resume
+import Keyframes
+import Playlist_window
+from Cue_store import cue_store, track_index
+from Workers import subtitle_loader, probe_service, keyframe_loader, autosync_worker
+from Scrub_preview import scrub_preview
 
 
 # current path
 BASE_DIR = os.path.split(os.path.realpath(__file__))[0]
 os.chdir(BASE_DIR)
+# with profiling on, a heartbeat that comes later than STALL_MS counts as a stall of the UI thread
+HEARTBEAT_MS = 20
+STALL_MS = 16
+RESUME_FLUSH_MS = 15000
+# while the slider is dragged, at most one seek per SCRUB_MS goes to the decoder
+SCRUB_MS = 80
 
 
 class MainWindow(QWidget):
@@ -45,25 +54,46 @@ class MainWindow(QWidget):
         # current video info
         self.file_name = ""
         self.subtitle_filename = ""
-        self.format_list = ['.flv', '.mp4', '.ts']
+        # every sidecar of the video, the context menu of ccChBox switches between them
+        self.subtitle_files = []
+        self.format_list = list(Functions.FORMAT_LIST)
         # video total time
         self.total_time = 1
+        # media info is probed in the background and cached in data.db
+        self._probe_service = probe_service(self)
+        self._probe_service.probed.connect(self.video_probed)
         self.save_current_video_info(True)
 
-        # save subtitle data
-        self.subtitle_data = ""
+        # save subtitle data, cues are indexed once when the file is opened
+        self.subtitle_data = cue_store()
+        self._subtitle_loader = None
+        # an optional second sidecar shown under the first one, e.g. another language
+        self.second_subtitle_filename = ""
+        self.second_subtitle_data = None
+        self._second_subtitle_loader = None
+        # the change points of the shown tracks, one lookup per tick answers for all of them
+        self.subtitle_index = track_index()
+        # matches the cues to the audio when asked from the context menu of ccChBox
+        self._autosync = None
 
         # all widgets, private attributes
-        # playlist
-        self._playlist = [] # FIXME 6.3: Replace by QMediaPlaylist?
+        # playlist, saved in the PLAYLIST table
+        self._playlist = Playlist_window.load_playlist()
         self._playlist_index = -1
+        self.playlist_window = None
+        self.library_window = None
         # player and audio output
         self._player = QMediaPlayer()
         self._audio_output = QAudioOutput()
         self._player.setAudioOutput(self._audio_output)
         self._video_widget = QVideoWidget()
         self._player.setVideoOutput(self._video_widget)
-        self._player.errorOccurred.connect(self._player_error)
+        # the next playlist item is buffered on a second player while the current one plays
+        self._next_player = None
+        self._next_file = ""
+        self._next_subtitle_file = ""
+        self._next_subtitle_loader = None
+        self._next_subtitle_data = None
         # create open button
         self.openBtn = QPushButton("Open")
         self.openBtn.setToolTip("Open a video file")
@@ -72,16 +102,23 @@ class MainWindow(QWidget):
         self.playBtn.setEnabled(False)
         self.playBtn.setIcon(self.style().standardIcon(QStyle.SP_MediaPlay))
         self.playBtn.setToolTip('Play/Stop')
+        # create button for the next playlist item
+        self.nextBtn = QPushButton()
+        self.nextBtn.setEnabled(bool(self._playlist))
+        self.nextBtn.setIcon(self.style().standardIcon(QStyle.SP_MediaSkipForward))
+        self.nextBtn.setToolTip('Next in playlist')
         # create slider
         self.slider = QSlider(Qt.Horizontal)
         self.slider.setRange(0, 0)
         self.slider.setEnabled(False)
-        self.slider.setToolTip('Moment')
+        # the frame and the time under the mouse pop up above the slider, instead of a tooltip
+        self.scrub_preview = scrub_preview(self.slider)
         # create button for cc
         self.ccChBox = QCheckBox()
         self.ccChBox.setChecked(False)
         self.ccChBox.setEnabled(False)
-        self.ccChBox.setToolTip('Open subtitle')
+        self.ccChBox.setToolTip('Open subtitle, right click to choose the subtitle file')
+        self.ccChBox.setContextMenuPolicy(Qt.CustomContextMenu)
         # create tool button for editor and timeline
         self.toolBtn_editor = QToolButton()
         self.toolBtn_editor.setIcon(self.style().standardIcon(QStyle.SP_ToolBarHorizontalExtensionButton))
@@ -94,6 +131,16 @@ class MainWindow(QWidget):
         self.toolBtn_timeline.setToolTip('Open timeline window')
         self.toolBtn_timeline.setEnabled(False)
         self.toolBtn_timeline.setToolButtonStyle(Qt.ToolButtonIconOnly)
+        # create tool button for playlist
+        self.toolBtn_playlist = QToolButton()
+        self.toolBtn_playlist.setIcon(self.style().standardIcon(QStyle.SP_FileDialogListView))
+        self.toolBtn_playlist.setToolTip('Open playlist window')
+        self.toolBtn_playlist.setToolButtonStyle(Qt.ToolButtonIconOnly)
+        # create tool button for the media library
+        self.toolBtn_library = QToolButton()
+        self.toolBtn_library.setIcon(self.style().standardIcon(QStyle.SP_DirHomeIcon))
+        self.toolBtn_library.setToolTip('Open library window')
+        self.toolBtn_library.setToolButtonStyle(Qt.ToolButtonIconOnly)
         # create spinbox for volume control
         self.volBox = QPushButton()
         self.volBox.setToolTip('Volume')
@@ -109,9 +156,9 @@ class MainWindow(QWidget):
         self.subtitle_box = subtitle()
         self.subtitle_box.setFixedWidth(self.width())
         self.subtitle_box.send_close_signal_to_mainwindow.connect(self.uncheck_ccChBox)
-        # create other windows
-        self.editor_window = editor_window()
-        self.timeline_window = timeline_window()
+        # other windows are created the first time their tool button is clicked
+        self.editor_window = None
+        self.timeline_window = None
 
         if self.ccChBox.isChecked():
             self.subtitle_box.show()
@@ -121,6 +168,49 @@ class MainWindow(QWidget):
         # create label
         self.status_label = QLabel()
         self.status_label.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Maximum)
+
+        # position updates are coalesced to the refresh rate of the screen
+        self._pending_position = None
+        self._shown_subtitle = None
+        self._total_time_text = Functions.change_position_into_time(self.total_time)
+        self.skipped_redraws = 0
+        # the count changes nearly every frame, the tooltip is only written when it is about to show
+        self.status_label.installEventFilter(self)
+        self._ui_timer = QTimer(self)
+        self._ui_timer.setTimerType(Qt.PreciseTimer)
+        self._ui_timer.setInterval(max(1, int(1000 / (self.screen().refreshRate() or 60))))
+        self._ui_timer.timeout.connect(self.refresh_ui)
+
+        # playback positions are kept in memory and written every RESUME_FLUSH_MS, on pause and on close
+        self._resume_position = 0
+        self._resume_timer = QTimer(self)
+        self._resume_timer.setInterval(RESUME_FLUSH_MS)
+        self._resume_timer.timeout.connect(Resume.flush)
+        self._resume_timer.start()
+
+        # seeks while dragging are coalesced and snapped to keyframes, the release seeks exactly
+        self._keyframes = None
+        self._keyframe_loader = None
+        self._scrub_target = None
+        self._scrub_timer = QTimer(self)
+        self._scrub_timer.setSingleShot(True)
+        self._scrub_timer.setInterval(SCRUB_MS)
+        self._scrub_timer.timeout.connect(self.seek_scrub)
+
+        # opt-in instrumentation, F12 shows the numbers in the status bar and Ctrl+Shift+P saves them
+        self._profile_overlay = False
+        if Profiler.ENABLED:
+            self._last_beat = time.perf_counter()
+            self._heartbeat = QTimer(self)
+            self._heartbeat.setTimerType(Qt.PreciseTimer)
+            self._heartbeat.setInterval(HEARTBEAT_MS)
+            self._heartbeat.timeout.connect(self.heartbeat)
+            self._heartbeat.start()
+            self._overlay_timer = QTimer(self)
+            self._overlay_timer.setInterval(500)
+            self._overlay_timer.timeout.connect(self.show_profile)
+            QShortcut(QKeySequence("F12"), self).activated.connect(self.toggle_profile_overlay)
+            QShortcut(QKeySequence("Ctrl+Shift+P"), self).activated.connect(self.dump_profile)
         
         # initialize the UI and show it
         self.init_ui()
@@ -135,14 +225,17 @@ class MainWindow(QWidget):
         # add widgets
         horizontal_layout.addWidget(self.openBtn)
         horizontal_layout.addWidget(self.playBtn)
+        horizontal_layout.addWidget(self.nextBtn)
         horizontal_layout.addWidget(self.slider)
         horizontal_layout.addWidget(self.ccChBox)
         horizontal_layout.addWidget(self.toolBtn_editor)
         horizontal_layout.addWidget(self.toolBtn_timeline)
+        horizontal_layout.addWidget(self.toolBtn_playlist)
+        horizontal_layout.addWidget(self.toolBtn_library)
         horizontal_layout.addWidget(self.volBox)
         horizontal_layout.addWidget(self.vol_slider)
-        horizontal_layout.setStretch(2, 5)
-        horizontal_layout.setStretch(7, 1)
+        horizontal_layout.setStretch(3, 5)
+        horizontal_layout.setStretch(10, 1)
         
         vertical_layout.addWidget(self._video_widget)
         vertical_layout.addLayout(horizontal_layout)
@@ -153,90 +246,388 @@ class MainWindow(QWidget):
 
         # media player signals
         self.ccChBox.clicked.connect(self.ccCheckBox_changed)
+        self.ccChBox.customContextMenuRequested.connect(self.choose_subtitle)
         self.volBox.clicked.connect(self.volBox_change_icon)
         self.openBtn.clicked.connect(self.open_file)
         self.playBtn.clicked.connect(self.play_video)
-        self._player.playbackStateChanged.connect(self.media_state_changed)
-        self._player.positionChanged.connect(self.position_changed)
-        self._player.durationChanged.connect(self.duration_changed)
-        self.slider.sliderMoved.connect(self.set_position)
+        self.nextBtn.clicked.connect(self.play_next)
+        self._connect_player(self._player)
+        self.slider.sliderMoved.connect(self.scrub)
+        self.slider.sliderReleased.connect(self.scrub_released)
         self.toolBtn_editor.clicked.connect(self.show_editor_window)
         self.toolBtn_timeline.clicked.connect(self.show_timeline_window)
+        self.toolBtn_playlist.clicked.connect(self.show_playlist_window)
+        self.toolBtn_library.clicked.connect(self.show_library_window)
         self.vol_slider.valueChanged.connect(self.setvol)
 
     def open_file(self):
         self._ensure_stopped()
         filename, _ = QFileDialog.getOpenFileName(self)
         if filename != '':
-            self._player.setSource(QUrl.fromLocalFile(filename))
-            self.playBtn.setEnabled(True)
-            self.status_label.setStyleSheet("background-color: rgb(255, 255, 255); color: black")
-            self.status_label.setAlignment(Qt.AlignRight)
-            self.status_label.setText("open successfully!")
-
-            # update buttons
-            self.slider.setEnabled(True)
-            self.toolBtn_editor.setEnabled(True)
-            self.toolBtn_timeline.setEnabled(True)
-            self.ccChBox.setEnabled(True)
-            self.volBox.setEnabled(True)
-
-            # save file name of the video and subtitle file
-            # judge whether the video format is supported
-            self.file_name = filename
-            support = False
-            for f in self.format_list:
-                if self.file_name.endswith(f):
-                    self.subtitle_filename = self.file_name[0:-len(f)] + ".vtt"
-                    support = True
-                    break
-            # whether the video is supported
-            if support:
-                pass
-            else:
-                self.status_label.setText("the video format is not supported!")
-            
-            # whether the subtitle file exists
-            if os.path.isfile(self.subtitle_filename):
-                with open(self.subtitle_filename, "r") as f:
-                    self.subtitle_data = f.readlines()
-                    self.subtitle_box.setText("find available subtitle!")
-                    self.subtitle_box.setAlignment(Qt.AlignCenter)
-                # self.send_open_signal_to_editor_window.emit(self.subtitle_filename)
-            else:
-                self.subtitle_box.setText("no subtitle file found!")  # no significance
-                self.subtitle_box.setAlignment(Qt.AlignCenter)  # no significance
-                # self.send_open_signal_to_editor_window.emit("clear items")
-                # if file is available, send signal to timeline window to init UI
-                # self.send_open_signal_to_timeline_window.emit()
-                self._player.play()
-                self._player.pause()
-                self.save_current_video_info(False)
-                self.setWindowTitle("My Media Player" + "   " + filename)
+            self.load_file(filename)
         else:
             self.status_label.setText("no video file was chosen!")
 
+    @Profiler.timed("MainWindow.load_file")
+    def load_file(self, filename, autoplay=False):
+        if filename == self._next_file and self._next_player is not None:
+            # the next playlist item is buffered already, just swap the players
+            self._swap_to_preloaded()
+        else:
+            self._ensure_stopped()
+            self._player.setSource(QUrl.fromLocalFile(filename))
+        self.playBtn.setEnabled(True)
+        self.status_label.setStyleSheet("background-color: rgb(255, 255, 255); color: black")
+        self.status_label.setAlignment(Qt.AlignRight)
+        self.status_label.setText("open successfully!")
+
+        # update buttons
+        self.slider.setEnabled(True)
+        self.toolBtn_editor.setEnabled(True)
+        self.toolBtn_timeline.setEnabled(True)
+        self.ccChBox.setEnabled(True)
+        self.volBox.setEnabled(True)
+
+        # save file name of the video and subtitle file
+        # judge whether the video format is supported
+        self.file_name = filename
+        # a file opened from outside the playlist is not followed by its next item
+        self._playlist_index = self._playlist.index(filename) if filename in self._playlist else -1
+        # the position is set once the media is loaded, see media_status_changed
+        self._resume_position = Resume.lookup(filename)
+        self.scrub_preview.set_video(filename)
+        self._start_keyframe_loader(filename)
+        Resume.flush()
+        if self._player.mediaStatus() in (QMediaPlayer.LoadedMedia, QMediaPlayer.BufferedMedia):
+            self.resume()
+        self.subtitle_filename = Functions.subtitle_file_for(filename, self.format_list)
+        self.subtitle_files = Functions.subtitle_files_for(filename, self.format_list)
+        # whether the video is supported
+        if self.subtitle_filename is None:
+            self.subtitle_filename = ""
+            self.status_label.setText("the video format is not supported!")
+        elif self.subtitle_files:
+            # <name>.vtt if it is there, else the first .srt/.ass next to the video
+            self.subtitle_filename = self.subtitle_files[0]
+
+        # whether the subtitle file exists, the cues are parsed in the background
+        # and playback does not wait for them
+        self._stop_subtitle_loader()
+        self._shown_subtitle = None
+        self.set_second_subtitle("")
+        if self._next_subtitle_file == self.subtitle_filename and self._next_subtitle_data is not None:
+            # pre-parsed while the previous item was playing
+            self._subtitle_loader, self.subtitle_data = self._next_subtitle_loader, self._next_subtitle_data
+            self._next_subtitle_loader, self._next_subtitle_data, self._next_subtitle_file = None, None, ""
+        else:
+            self._subtitle_loader, self.subtitle_data = self._start_subtitle_loader(self.subtitle_filename)
+        if os.path.isfile(self.subtitle_filename):
+            self.subtitle_box.setText("find available subtitle!")
+            self.subtitle_box.setAlignment(Qt.AlignCenter)
+            # self.send_open_signal_to_editor_window.emit(self.subtitle_filename)
+        else:
+            self.subtitle_box.setText("no subtitle file found!")  # no significance
+            self.subtitle_box.setAlignment(Qt.AlignCenter)  # no significance
+            # self.send_open_signal_to_editor_window.emit("clear items")
+            # if file is available, send signal to timeline window to init UI
+            # self.send_open_signal_to_timeline_window.emit()
+        self._player.play()
+        if not autoplay:
+            self._player.pause()
+        self.save_current_video_info(False)
+        self.setWindowTitle("My Media Player" + "   " + filename)
+        self.preload_next()
+
+    def _start_subtitle_loader(self, subtitle_filename):
+        """ return (loader, cue_store) for the file, the loader fills the store in the background """
+        store = cue_store()
+        if not os.path.isfile(subtitle_filename):
+            return None, store
+        loader = subtitle_loader(subtitle_filename, self)
+        loader.cues_parsed.connect(self.add_subtitle_cues)
+        loader.parse_failed.connect(self.status_label.setText)
+        loader.start()
+        return loader, store
+
+    @Profiler.timed("MainWindow.save_current_video_info")
     def save_current_video_info(self, init = False):
         # save current video infomation
         if init:
-            sql = '''UPDATE CURRENT_VIDEO_INFO SET PATH_VIDEO = "", LAST_PATH = "", DURATION = 1000;'''
+            sql = '''UPDATE CURRENT_VIDEO_INFO SET PATH_VIDEO = '', LAST_PATH = '', DURATION = 1000;'''
             Functions.sqlite_update(sql)
         else:
-            sql = f'''UPDATE CURRENT_VIDEO_INFO SET PATH_VIDEO = {self.file_name}, LAST_PATH = {os.path.dirname(self.file_name)}, DURATION = {VideoFileClip(self.file_name).duration};'''
-            Functions.sqlite_update(sql)     
+            # the duration comes from the probe service, see video_probed
+            self._probe_service.request(self.file_name)
+
+    @Slot(str, object)
+    def video_probed(self, path, info):
+        if path != self.file_name or info is None:
+            return
+        sql = '''UPDATE CURRENT_VIDEO_INFO SET PATH_VIDEO = ?, LAST_PATH = ?, DURATION = ?;'''
+        Functions.sqlite_update(sql, (path, os.path.dirname(path), info["duration"]))
 
+    @Profiler.timed("MainWindow.position_changed")
     def position_changed(self, position):
+        # only remember the newest position, the widgets are refreshed at most once per frame
+        if self._pending_position is not None:
+            self.skipped_redraws += 1
+        self._pending_position = position
+        if not self._ui_timer.isActive():
+            self._ui_timer.start()
+
+    @Profiler.timed("MainWindow.refresh_ui")
+    def refresh_ui(self):
+        position = self._pending_position
+        if position is None:
+            # nothing happened since the last frame, stop waking up
+            self._ui_timer.stop()
+            return
+        self._pending_position = None
         # send player position to timeline window
         # self.send_position_signal_to_image_frame_in_timeline_window.emit(position)
-        self.slider.setValue(position)
-        self.status_label.setText("{0}/{1}".format(str(Functions.change_position_into_time(position)),
-                                            str(Functions.change_position_into_time(self.total_time))))
-        self.subtitle_box.setText(Functions.get_subtitle(position, self.subtitle_data))
-        self.subtitle_box.document().setDefaultTextOption(QTextOption(Qt.AlignCenter))
-   
+        # the handle stays under the mouse while it is dragged
+        if not self.slider.isSliderDown():
+            self.slider.setValue(position)
+        # stop() reports position 0, and the new file reports it too until the resume position is set
+        if not self._resume_position and self._player.playbackState() != QMediaPlayer.StoppedState:
+            Resume.remember(self.file_name, position, self.total_time)
+        if not self._profile_overlay:
+            self.status_label.setText("{0}/{1}".format(Functions.change_position_into_time(position), self._total_time_text))
+        # touching the QTextEdit relayouts it, so only do it when the cue changes
+        text = Functions.get_subtitle(position, self._subtitle_tracks())
+        if text != self._shown_subtitle:
+            self._shown_subtitle = text
+            self.subtitle_box.setText(text)
+            self.subtitle_box.document().setDefaultTextOption(QTextOption(Qt.AlignCenter))
+        else:
+            self.skipped_redraws += 1
+
+    def eventFilter(self, widget, event) -> bool:
+        if widget is self.status_label and event.type() == QEvent.ToolTip:
+            self.status_label.setToolTip(f"skipped redraws: {self.skipped_redraws}")
+        return super().eventFilter(widget, event)
+
+    def heartbeat(self):
+        # the UI thread was busy for as long as the timer came late
+        now = time.perf_counter()
+        late = now - self._last_beat - HEARTBEAT_MS / 1000
+        self._last_beat = now
+        if late > STALL_MS / 1000:
+            Profiler.record("ui_stall", late)
+
+    def toggle_profile_overlay(self):
+        self._profile_overlay = not self._profile_overlay
+        if self._profile_overlay:
+            self._overlay_timer.start()
+            self.show_profile()
+        else:
+            self._overlay_timer.stop()
+            self.status_label.setText("")
+
+    def show_profile(self):
+        self.status_label.setText(Profiler.summary())
+
+    def dump_profile(self):
+        filename = os.path.join(BASE_DIR, "Cache", "profile.json")
+        Profiler.dump(filename)
+        self.status_label.setText("profile saved to " + filename)
+
     def duration_changed(self, duration):
         self.slider.setRange(0, duration)
         self.total_time = duration
+        if self.timeline_window is not None:
+            self.timeline_window.set_video(self.file_name, duration)
+        self._total_time_text = Functions.change_position_into_time(duration)
+
+    @Slot(object)
+    def add_subtitle_cues(self, batch):
+        # batches from a loader of a previous file are dropped
+        if self.sender() is self._subtitle_loader:
+            self.subtitle_data.extend(batch)
+            self.subtitle_index.add_batch(self.subtitle_data, batch)
+        elif self.sender() is self._second_subtitle_loader:
+            self.second_subtitle_data.extend(batch)
+            self.subtitle_index.add_batch(self.second_subtitle_data, batch)
+        elif self.sender() is self._next_subtitle_loader:
+            self._next_subtitle_data.extend(batch)
+
+    def _connect_player(self, player):
+        player.errorOccurred.connect(self._player_error)
+        player.playbackStateChanged.connect(self.media_state_changed)
+        player.positionChanged.connect(self.position_changed)
+        player.durationChanged.connect(self.duration_changed)
+        player.mediaStatusChanged.connect(self.media_status_changed)
+
+    def _disconnect_player(self, player):
+        player.errorOccurred.disconnect(self._player_error)
+        player.playbackStateChanged.disconnect(self.media_state_changed)
+        player.positionChanged.disconnect(self.position_changed)
+        player.durationChanged.disconnect(self.duration_changed)
+        player.mediaStatusChanged.disconnect(self.media_status_changed)
+
+    def preload_next(self):
+        """ buffer the playlist item after the current one on a second player and parse its subtitle """
+        if self.file_name not in self._playlist:
+            return
+        self._playlist_index = self._playlist.index(self.file_name)
+        if self._playlist_index + 1 >= len(self._playlist):
+            return
+        next_file = self._playlist[self._playlist_index + 1]
+        if next_file == self._next_file:
+            return
+        if self._next_player is None:
+            self._next_player = QMediaPlayer(self)
+        self._next_file = next_file
+        self._next_player.setSource(QUrl.fromLocalFile(next_file))
+        self._probe_service.request(next_file)
+        self._stop_next_subtitle_loader()
+        next_subtitles = Functions.subtitle_files_for(next_file, self.format_list)
+        self._next_subtitle_file = next_subtitles[0] if next_subtitles else ""
+        self._next_subtitle_loader, self._next_subtitle_data = self._start_subtitle_loader(self._next_subtitle_file)
+
+    def _swap_to_preloaded(self):
+        old = self._player
+        self._disconnect_player(old)
+        old.stop()
+        old.setVideoOutput(None)
+        old.setAudioOutput(None)
+        self._player, self._next_player = self._next_player, old
+        self._player.setAudioOutput(self._audio_output)
+        self._player.setVideoOutput(self._video_widget)
+        self._connect_player(self._player)
+        self._next_file = ""
+        # durationChanged was sent while it was buffering, so it is not sent again
+        self.duration_changed(self._player.duration())
+
+    def play_next(self):
+        if self._playlist_index + 1 < len(self._playlist):
+            self.load_file(self._playlist[self._playlist_index + 1], autoplay=True)
+
+    def play_item(self, index):
+        self.load_file(self._playlist[index], autoplay=True)
+
+    def media_status_changed(self, status):
+        if status in (QMediaPlayer.LoadedMedia, QMediaPlayer.BufferedMedia):
+            self.resume()
+        if status == QMediaPlayer.EndOfMedia:
+            # watched to the end, next time it starts from the beginning
+            Resume.remember(self.file_name, self.total_time, self.total_time)
+            # only a playlist item moves on, the playlist may have been edited while it played
+            if self.file_name in self._playlist:
+                self._playlist_index = self._playlist.index(self.file_name)
+                self.play_next()
+
+    def resume(self):
+        if self._resume_position:
+            self._player.setPosition(self._resume_position)
+            self.status_label.setText("resumed at " + Functions.change_position_into_time(self._resume_position))
+            self._resume_position = 0
+
+    def set_playlist(self, playlist):
+        self._playlist = playlist
+        Playlist_window.save_playlist(playlist)
+        self.nextBtn.setEnabled(bool(playlist))
+        self.preload_next()
+
+    def choose_subtitle(self, pos):
+        if not self.subtitle_files:
+            return
+        menu = QMenu(self)
+        for filename in self.subtitle_files:
+            action = menu.addAction(os.path.basename(filename))
+            action.setCheckable(True)
+            action.setChecked(filename == self.subtitle_filename)
+            action.setData(filename)
+        second = menu.addMenu("second track")
+        for filename in [""] + self.subtitle_files:
+            action = second.addAction(os.path.basename(filename) if filename else "none")
+            action.setCheckable(True)
+            action.setChecked(filename == self.second_subtitle_filename)
+            action.setData(("second", filename))
+        menu.addSeparator()
+        auto_sync = menu.addAction("auto-sync to the audio")
+        auto_sync.setEnabled(bool(self.subtitle_data) and not self._subtitle_loading())
+        chosen = menu.exec(self.ccChBox.mapToGlobal(pos))
+        if chosen is auto_sync:
+            self.auto_sync()
+        elif chosen is not None and isinstance(chosen.data(), tuple):
+            self.set_second_subtitle(chosen.data()[1])
+        elif chosen is not None and chosen.data() != self.subtitle_filename:
+            self.subtitle_filename = chosen.data()
+            self._stop_subtitle_loader()
+            self._shown_subtitle = None
+            self._subtitle_loader, self.subtitle_data = self._start_subtitle_loader(self.subtitle_filename)
+
+    def set_second_subtitle(self, filename):
+        """ show the cues of filename under the ones of subtitle_filename, "" for only one track """
+        if filename == self.second_subtitle_filename:
+            return
+        if self._second_subtitle_loader is not None:
+            self._second_subtitle_loader.requestInterruption()
+            self._second_subtitle_loader.wait()
+            self._second_subtitle_loader = None
+        self.second_subtitle_filename = filename
+        self.second_subtitle_data = None
+        self._shown_subtitle = None
+        if filename:
+            self._second_subtitle_loader, self.second_subtitle_data = self._start_subtitle_loader(filename)
+
+    def _subtitle_tracks(self):
+        # one track is looked up in its own store, two through the merged index
+        if self.second_subtitle_data is None:
+            return self.subtitle_data
+        self.subtitle_index.set_tracks((self.subtitle_data, self.second_subtitle_data))
+        return self.subtitle_index
+
+    def _subtitle_loading(self):
+        return self._subtitle_loader is not None and self._subtitle_loader.isRunning()
+
+    def auto_sync(self):
+        """ move the loaded cues onto the voices of the audio, the subtitle file is not changed """
+        self._stop_autosync()
+        self._autosync = autosync_worker(self.file_name, self.subtitle_filename,
+                                         bytes(self.subtitle_data.starts), bytes(self.subtitle_data.ends), self)
+        self._autosync.synced.connect(self.auto_synced)
+        self._autosync.sync_failed.connect(self.auto_sync_failed)
+        self._autosync.start()
+        self.status_label.setText("matching the subtitle to the audio...")
+
+    def _stop_autosync(self):
+        if self._autosync is not None:
+            self._autosync.requestInterruption()
+            self._autosync.wait()
+            self._autosync = None
+
+    @Slot(str, str, object)
+    def auto_synced(self, path, subtitle_filename, result):
+        if path != self.file_name or subtitle_filename != self.subtitle_filename or self._subtitle_loading():
+            return
+        import Autosync
+        import Resync
+        offset, factor, score = result
+        if score < Autosync.MIN_SCORE:
+            self.status_label.setText("the subtitle does not match the audio well enough to sync it")
+            return
+        self.subtitle_data = Resync.retime(self.subtitle_data, Autosync.transform(offset, factor))
+        self._shown_subtitle = None
+        self.status_label.setText(f"subtitle moved by {offset / 1000:+.2f}s and stretched by {factor:.5f}")
+
+    @Slot(str, str)
+    def auto_sync_failed(self, path, reason):
+        if path == self.file_name:
+            self.status_label.setText("auto-sync failed: " + reason)
+
+    @Slot(str)
+    def subtitle_saved(self, filename):
+        # the editor rewrote the subtitle of the current video, parse it again
+        if filename == self.subtitle_filename:
+            self._stop_subtitle_loader()
+            self._shown_subtitle = None
+            self._subtitle_loader, self.subtitle_data = self._start_subtitle_loader(filename)
+        if filename == self.second_subtitle_filename:
+            # the next set_second_subtitle has to start over
+            self.second_subtitle_filename = ""
+            self.set_second_subtitle(filename)
 
     @Slot()
     def uncheck_ccChBox(self):
@@ -264,6 +655,43 @@ class MainWindow(QWidget):
 
     def set_position(self, position):
         self._player.setPosition(position)
+
+    def scrub(self, position):
+        # the first move seeks at once, the ones during the next SCRUB_MS only leave the newest target
+        self._scrub_target = position
+        if not self._scrub_timer.isActive():
+            self.seek_scrub()
+            self._scrub_timer.start()
+
+    def seek_scrub(self):
+        if self._scrub_target is None:
+            return
+        self._player.setPosition(Keyframes.snap(self._keyframes, self._scrub_target))
+        self._scrub_target = None
+
+    def scrub_released(self):
+        self._scrub_timer.stop()
+        self._scrub_target = None
+        self._player.setPosition(self.slider.value())
+
+    def _start_keyframe_loader(self, filename):
+        self._keyframes = None
+        self._stop_keyframe_loader()
+        self._keyframe_loader = keyframe_loader(filename, self)
+        self._keyframe_loader.keyframes_ready.connect(self.keyframes_loaded)
+        self._keyframe_loader.start()
+
+    def _stop_keyframe_loader(self):
+        if self._keyframe_loader is not None:
+            self._keyframe_loader.requestInterruption()
+            self._keyframe_loader.wait()
+            self._keyframe_loader = None
+
+    @Slot(str, object)
+    def keyframes_loaded(self, path, times):
+        if path == self.file_name:
+            self._keyframes = times
+            self.scrub_preview.keyframes = times
  
     def ccCheckBox_changed(self):
         if self.ccChBox.isChecked():
@@ -290,24 +718,46 @@ class MainWindow(QWidget):
             self.playBtn.setIcon(self.style().standardIcon(QStyle.SP_MediaPause))
         else:
             self.playBtn.setIcon(self.style().standardIcon(QStyle.SP_MediaPlay))
+            # paused or stopped, a good moment to write the position
+            Resume.flush()
   
     def closeEvent(self, event) -> None:
         # save mainwindow's location to database
-        sql = f'''UPDATE MAIN_WINDOW SET ID = 1, X = {self.x()}, Y = {self.y()}, Width = {self.width()}, Height = {self.height()};'''
-        Functions.sqlite_update(sql)
+        Functions.save_window_location(self, "MAIN_WINDOW")
 
         self._ensure_stopped()
+        Resume.flush()
+        self._stop_subtitle_loader()
+        self._stop_next_subtitle_loader()
+        self.set_second_subtitle("")
+        self._stop_keyframe_loader()
+        self._stop_autosync()
+        self._probe_service.shutdown()
+        self.scrub_preview.shutdown()
+        if self.timeline_window is not None:
+            self.timeline_window.shutdown()
+        if self.library_window is not None:
+            self.library_window.shutdown()
+        if self.editor_window is not None:
+            self.editor_window.close_journal()
+        if Profiler.ENABLED:
+            self.dump_profile()
         return super().closeEvent(event)
 
     def load_location(self):
-        conn = sqlite3.connect('data.db')
-        c = conn.cursor()
-        c.execute("SELECT X, Y, Width, Height from MAIN_WINDOW")
-        data = c.fetchall()
-        self.move(data[0][0], data[0][1])
-        self.resize(data[0][2], data[0][3])
-        conn.commit()
-        conn.close()
+        Functions.load_window_location(self, "MAIN_WINDOW")
+
+    def _stop_subtitle_loader(self):
+        if self._subtitle_loader is not None:
+            self._subtitle_loader.requestInterruption()
+            self._subtitle_loader.wait()
+            self._subtitle_loader = None
+
+    def _stop_next_subtitle_loader(self):
+        if self._next_subtitle_loader is not None:
+            self._next_subtitle_loader.requestInterruption()
+            self._next_subtitle_loader.wait()
+            self._next_subtitle_loader = None
 
     @Slot()
     def _ensure_stopped(self):
@@ -321,13 +771,57 @@ class MainWindow(QWidget):
 
     @Slot()
     def show_editor_window(self):
+        if self.editor_window is None:
+            from Editor_window import editor_window
+            self.editor_window = editor_window()
+            self.editor_window.send_saved_signal_to_mainwindow.connect(self.subtitle_saved)
+        if os.path.isfile(self.subtitle_filename) and self.editor_window.subtitle_filename != self.subtitle_filename:
+            self.editor_window.load_subtitle_file(self.subtitle_filename)
         if self.editor_window.isHidden():
             self.editor_window.show()
         else:
             self.editor_window.hide()
 
+    @Slot()
+    def show_playlist_window(self):
+        if self.playlist_window is None:
+            self.playlist_window = Playlist_window.playlist_window(self._playlist)
+            self.playlist_window.playlist_changed.connect(self.set_playlist)
+            self.playlist_window.item_activated.connect(self.play_item)
+        if self.playlist_window.isHidden():
+            self.playlist_window.show()
+        else:
+            self.playlist_window.hide()
+
+    @Slot()
+    def show_library_window(self):
+        if self.library_window is None:
+            from Library_window import library_window
+            self.library_window = library_window()
+            self.library_window.open_requested.connect(self.open_at)
+        if self.library_window.isHidden():
+            self.library_window.show()
+        else:
+            self.library_window.hide()
+
+    @Slot(str, int)
+    def open_at(self, filename, position):
+        if filename == self.file_name:
+            self.set_position(position)
+            return
+        self.load_file(filename)
+        # a seek before the media is loaded is dropped, so the cue goes the way of a resume
+        # position, and it wins over the one load_file looked up
+        self._resume_position = position
+        if self._player.mediaStatus() in (QMediaPlayer.LoadedMedia, QMediaPlayer.BufferedMedia):
+            self.resume()
+
     @Slot()
     def show_timeline_window(self):
+        if self.timeline_window is None:
+            from Timeline_window import timeline_window
+            self.timeline_window = timeline_window()
+        self.timeline_window.set_video(self.file_name, self.total_time)
         if self.timeline_window.isHidden():
             self.timeline_window.show()
         else:
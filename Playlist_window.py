@@ -1 +1,84 @@
-pass
\ No newline at end of file
+from PySide6.QtWidgets import QWidget, QPushButton, QListWidget, QVBoxLayout, QHBoxLayout, QFileDialog
+from PySide6.QtGui import QIcon
+from PySide6.QtCore import Signal
+import Database
+import Functions
+import os
+
+
+def load_playlist():
+    """ the saved playlist, in the order it was saved """
+    return [row[0] for row in Functions.sqlite_fetch("SELECT NAME FROM PLAYLIST ORDER BY rowid")]
+
+
+def save_playlist(playlist):
+    # one transaction, a crash in between never leaves the playlist half written
+    Database.submit_together([("DELETE FROM PLAYLIST;", ())] +
+                             [("INSERT INTO PLAYLIST (NAME) VALUES (?);", (name,)) for name in playlist])
+
+
+class playlist_window(QWidget):
+    playlist_changed = Signal(list)
+    item_activated = Signal(int)
+
+    def __init__(self, playlist):
+        super().__init__()
+
+        # set title for the window
+        self.setWindowTitle("playlist")
+        self.setWindowIcon(QIcon('.\\Icon\\player.png'))
+        self.resize(400, 500)
+
+        self.list = QListWidget()
+        for name in playlist:
+            self.list.addItem(os.path.basename(name))
+        self._playlist = list(playlist)
+
+        # buttons
+        self.add = QPushButton("add")
+        self.add.clicked.connect(self.add_files)
+        self.remove = QPushButton("remove")
+        self.remove.clicked.connect(self.remove_selected)
+        self.up = QPushButton("up")
+        self.up.clicked.connect(lambda: self.move_selected(-1))
+        self.down = QPushButton("down")
+        self.down.clicked.connect(lambda: self.move_selected(1))
+        self.list.itemDoubleClicked.connect(lambda item: self.item_activated.emit(self.list.row(item)))
+
+        buttons = QHBoxLayout()
+        for button in (self.add, self.remove, self.up, self.down):
+            buttons.addWidget(button)
+        layout = QVBoxLayout()
+        layout.addLayout(buttons)
+        layout.addWidget(self.list)
+        self.setLayout(layout)
+
+    def add_files(self):
+        filenames, _ = QFileDialog.getOpenFileNames(self)
+        for name in filenames:
+            self._playlist.append(name)
+            self.list.addItem(os.path.basename(name))
+        if filenames:
+            self.playlist_changed.emit(list(self._playlist))
+
+    def remove_selected(self):
+        row = self.list.currentRow()
+        if row < 0:
+            return
+        self.list.takeItem(row)
+        del self._playlist[row]
+        self.playlist_changed.emit(list(self._playlist))
+
+    def move_selected(self, step):
+        row = self.list.currentRow()
+        target = row + step
+        if row < 0 or not 0 <= target < len(self._playlist):
+            return
+        self._playlist.insert(target, self._playlist.pop(row))
+        self.list.insertItem(target, self.list.takeItem(row))
+        self.list.setCurrentRow(target)
+        self.playlist_changed.emit(list(self._playlist))
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,99 @@
+import functools
+import json
+import os
+import threading
+import time
+
+
+# opt-in, set MYPLAYER_PROFILE=1 before starting the player, otherwise timed() leaves functions untouched
+ENABLED = os.environ.get("MYPLAYER_PROFILE", "") not in ("", "0")
+# bucket i holds the calls that took less than 2 ** i microseconds
+BUCKETS = 32
+
+_stats = {}
+_lock = threading.Lock()
+_started = time.time()
+
+
+class histogram:
+    """ call count, total, max and log2 latency buckets of one instrumented name """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * BUCKETS
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.buckets[min(int(seconds * 1e6).bit_length(), BUCKETS - 1)] += 1
+
+    def percentile(self, fraction):
+        """ upper bound in ms of the bucket the fraction-th call falls in """
+        wanted = fraction * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= wanted:
+                return min(2 ** i / 1000, self.max * 1000)
+        return 0.0
+
+    def to_dict(self):
+        return {"count": self.count,
+                "total_ms": self.total * 1000,
+                "mean_ms": self.total * 1000 / self.count if self.count else 0.0,
+                "max_ms": self.max * 1000,
+                "p50_ms": self.percentile(0.5),
+                "p99_ms": self.percentile(0.99),
+                "buckets_us": {f"<{2 ** i}": n for i, n in enumerate(self.buckets) if n}}
+
+
+def record(name, seconds):
+    with _lock:
+        if name not in _stats:
+            _stats[name] = histogram()
+        _stats[name].add(seconds)
+
+
+def timed(name):
+    """ decorator, record every call of the function under name when profiling is on """
+    def decorate(function):
+        if not ENABLED:
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def snapshot():
+    with _lock:
+        return {name: h.to_dict() for name, h in sorted(_stats.items())}
+
+
+def summary(limit=4):
+    """ one line for the status bar, the names that took the most time first """
+    with _lock:
+        heaviest = sorted(_stats.items(), key=lambda item: item[1].total, reverse=True)[:limit]
+        return "   ".join(f"{name} {h.count}x p99 {h.percentile(0.99):.2f}ms max {h.max * 1000:.1f}ms"
+                           for name, h in heaviest)
+
+
+def dump(filename):
+    """ write every histogram to filename as JSON """
+    os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+    with open(filename, "w", encoding="utf-8") as f:
+        json.dump({"started": _started, "seconds": time.time() - _started, "stats": snapshot()}, f, indent=4)
+    print("profile saved to " + filename)
+
+
+if __name__ == "__main__":
+    pass
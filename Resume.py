@@ -0,0 +1,62 @@
+import time
+import Database
+
+
+# closer than this to the start or the end of a video, it starts from the beginning next time
+MARGIN_MS = 5000
+
+# path -> (position, duration) that are not in data.db yet
+_pending = {}
+
+
+def create_table():
+    Database.execute('''CREATE TABLE IF NOT EXISTS RESUME
+                (PATH     TEXT PRIMARY KEY,
+                    POSITION INT NOT NULL,
+                    DURATION INT NOT NULL,
+                    UPDATED  INT NOT NULL);''')
+
+
+def remember(path, position, duration):
+    """ keep the newest position of path in memory, nothing is written until flush """
+    if path:
+        _pending[path] = (position, duration)
+
+
+def lookup(path):
+    """ the position to resume path from, 0 to start from the beginning """
+    if path in _pending:
+        position, duration = _pending[path]
+    else:
+        row = Database.fetchone("SELECT POSITION, DURATION FROM RESUME WHERE PATH = ?", (path,))
+        if row is None:
+            return 0
+        position, duration = row
+    return position if _resumable(position, duration) else 0
+
+
+def _resumable(position, duration):
+    return position > MARGIN_MS and (duration <= 0 or position < duration - MARGIN_MS)
+
+
+def flush():
+    """ hand the pending positions to the write queue, they are committed together in one transaction """
+    if not _pending:
+        return
+    now = int(time.time())
+    keep, drop = [], []
+    for path, (position, duration) in _pending.items():
+        if _resumable(position, duration):
+            keep.append((path, position, duration, now))
+        else:
+            drop.append((path,))
+    _pending.clear()
+    if keep:
+        Database.submit_many("INSERT OR REPLACE INTO RESUME (PATH, POSITION, DURATION, UPDATED) VALUES (?, ?, ?, ?)",
+                             keep)
+    if drop:
+        Database.submit_many("DELETE FROM RESUME WHERE PATH = ?", drop)
+
+
+if __name__ == "__main__":
+    pass
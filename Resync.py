@@ -0,0 +1,164 @@
+""" retime every cue of a subtitle at once
+
+    python Resync.py movie.srt shift -1500                      1.5 s earlier
+    python Resync.py movie.srt stretch 25/23.976                 timed for 25 fps, the video is 23.976 fps
+    python Resync.py movie.srt anchors "1=00:00:12.300, 840=01:31:02.000" -o fixed.vtt
+"""
+import argparse
+import math
+import os
+import sys
+from array import array
+import numpy as np
+import Functions
+import Subtitle_parser
+
+
+MODES = ("shift", "stretch", "anchors")
+# 25/23.976 is 1.04, a stretch beyond this factor either way is a typo
+MAX_FACTOR = 10
+# ms, the longest shift
+MAX_OFFSET = 24 * 3600 * 1000
+
+
+def shift(offset):
+    return lambda times: times + offset
+
+
+def stretch(factor, origin=0):
+    """ scale the times around origin, factor is e.g. subtitle fps / video fps """
+    if factor <= 0:
+        raise ValueError("the stretch factor has to be positive")
+    return lambda times: origin + (times - origin) * factor
+
+
+def fit_anchors(pairs):
+    """ piecewise linear map through the (old, new) time pairs
+
+    np.interp holds the value of the first and last anchor, the cues outside them follow
+    the slope of the outer segments instead, a single anchor is a shift.
+    """
+    if not pairs:
+        raise ValueError("at least one anchor is needed")
+    old, new = (np.array(column, dtype=np.float64) for column in zip(*sorted(pairs)))
+    if np.any(np.diff(old) <= 0) or np.any(np.diff(new) <= 0):
+        # a map that is not increasing would change the order of the cues
+        raise ValueError("the anchors have to be in the same order before and after")
+    if len(old) == 1:
+        return shift(new[0] - old[0])
+    first = (new[1] - new[0]) / (old[1] - old[0])
+    last = (new[-1] - new[-2]) / (old[-1] - old[-2])
+
+    def fit(times):
+        return np.where(times < old[0], new[0] + (times - old[0]) * first,
+                        np.where(times > old[-1], new[-1] + (times - old[-1]) * last,
+                                 np.interp(times, old, new)))
+    return fit
+
+
+def apply(function, times):
+    """ the times (ms) through function, whole milliseconds like the timestamps in the file and never negative """
+    return np.clip(np.rint(function(np.asarray(times, dtype=np.float64))), 0, 2 ** 31 - 1).astype(np.int32)
+
+
+def retime(store, function):
+    """ a cue_store with the cues of store moved by function, which has to be increasing """
+    starts = apply(function, np.frombuffer(store.starts, dtype=np.int32))
+    ends = np.maximum(apply(function, np.frombuffer(store.ends, dtype=np.int32)), starts)
+    return store.with_times(array('i', starts.tobytes()), array('i', ends.tobytes()))
+
+
+def parse_offset(text):
+    """ -1500 (ms) or -00:00:01.500 """
+    text = text.strip()
+    sign = -1 if text.startswith("-") else 1
+    text = text.lstrip("+-").strip()
+    if ":" in text:
+        position = Functions.change_time_into_position(text)
+        if position is None:
+            raise ValueError("broken time " + text)
+        return _checked_offset(sign * position)
+    return _checked_offset(sign * int(text))
+
+
+def _checked_offset(offset):
+    # a shift past a day moves every cue off the video or onto 0, it is a typo
+    if not (math.isfinite(offset) and abs(offset) <= MAX_OFFSET):
+        raise ValueError("the offset can not be more than 24 hours")
+    return offset
+
+
+def parse_factor(text):
+    """ 1.0427, or 25/23.976 for a subtitle timed at 25 fps on a 23.976 fps video """
+    numerator, _, denominator = text.partition("/")
+    factor = float(numerator)
+    if denominator:
+        if float(denominator) == 0:
+            raise ValueError("the frame rate below the / can not be 0")
+        factor /= float(denominator)
+    # nan, inf or a factor like 1/0.0000001 would put every cue at 0 or at the end of time
+    if not (math.isfinite(factor) and 1 / MAX_FACTOR <= factor <= MAX_FACTOR):
+        raise ValueError(f"the factor has to be between {1 / MAX_FACTOR:g} and {MAX_FACTOR:g}")
+    return factor
+
+
+def parse_anchors(text, start_of):
+    """ "cue=time, ..." or "time=time, ...", a cue number (from 1) stands for the start time of that cue """
+    pairs = []
+    for item in text.split(","):
+        if not item.strip():
+            continue
+        old, separator, new = item.partition("=")
+        if not separator:
+            raise ValueError("an anchor looks like 12=00:01:02.500")
+        old = old.strip()
+        try:
+            if not old.isdigit():
+                old = parse_offset(old)
+            elif int(old) < 1:
+                raise IndexError
+            else:
+                old = start_of(int(old) - 1)
+        except IndexError:
+            raise ValueError("there is no cue " + old) from None
+        pairs.append((old, parse_offset(new)))
+    return pairs
+
+
+def transform(mode, value, start_of):
+    """ the time map the resync dialog or the command line asks for, ValueError if value does not fit mode """
+    if mode == "shift":
+        return shift(parse_offset(value))
+    if mode == "stretch":
+        return stretch(parse_factor(value))
+    if mode == "anchors":
+        return fit_anchors(parse_anchors(value, start_of))
+    raise ValueError("unknown mode " + mode)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("subtitle")
+    parser.add_argument("mode", choices=MODES)
+    parser.add_argument("value", help="offset, factor or anchors, put -- before a negative time like -00:00:01.500")
+    parser.add_argument("-o", "--output", help="write here instead of over the subtitle (.vtt or .srt)")
+    args = parser.parse_args()
+
+    output = args.output or args.subtitle
+    if not Subtitle_parser.writable(output):
+        print(output + "   can not be written, use -o with a .vtt or .srt file")
+        return 1
+    store = Subtitle_parser.load_file(args.subtitle)
+    try:
+        function = transform(args.mode, args.value, lambda row: store.starts[row])
+    except ValueError as e:
+        print(e)
+        return 1
+    store = retime(store, function)
+    Subtitle_parser.write_cues(output, ((store.starts[i], store.ends[i], store.text(i)) for i in range(len(store))))
+    print(f"{len(store)} cues written to {os.path.abspath(output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
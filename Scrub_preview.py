@@ -0,0 +1,145 @@
+from PySide6.QtWidgets import QWidget, QLabel, QVBoxLayout, QStyle
+from PySide6.QtGui import QPixmap
+from PySide6.QtCore import Qt, QEvent, QObject, QPoint, QTimer, Slot
+from Workers import thumbnail_service
+import Thumbnail
+import Keyframes
+import Functions
+
+
+PREVIEW_WIDTH = 192
+# the cursor has to rest this long before a frame that is not in memory is requested
+HOVER_MS = 40
+# without a keyframe index, hover positions are rounded to this step so nearby ones share a thumbnail
+STEP_MS = 1000
+# decoded previews kept in memory, enough to sweep back and forth over the slider
+LRU_COUNT = 128
+
+
+class scrub_preview(QObject):
+    """ frame preview above the seek slider while the mouse hovers over it
+
+    at most one frame is decoded at a time, the cursor positions passed meanwhile are
+    coalesced into the newest one, which is requested once the running decode is done.
+    """
+
+    def __init__(self, slider):
+        super().__init__(slider)
+        self.slider = slider
+        self.file_name = ""
+        # keyframe times of the video, hover positions snap to them like the drag seeks do
+        self.keyframes = None
+        self._pixmaps = Thumbnail.memory_lru(LRU_COUNT)
+        self._wanted = None
+        self._in_flight = None
+
+        self.popup = QWidget(None, Qt.ToolTip)
+        self.image = QLabel()
+        self.image.setFixedWidth(PREVIEW_WIDTH)
+        self.image.setAlignment(Qt.AlignCenter)
+        self.time = QLabel()
+        self.time.setAlignment(Qt.AlignCenter)
+        layout = QVBoxLayout()
+        layout.setContentsMargins(2, 2, 2, 2)
+        layout.setSpacing(0)
+        layout.addWidget(self.image)
+        layout.addWidget(self.time)
+        self.popup.setLayout(layout)
+
+        self.thumbnails = thumbnail_service(self, workers=1)
+        self.thumbnails.thumbnail_ready.connect(self.thumbnail_ready)
+        self.thumbnails.thumbnail_failed.connect(self.thumbnail_failed)
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(HOVER_MS)
+        self._timer.timeout.connect(self.request_wanted)
+
+        slider.setMouseTracking(True)
+        slider.installEventFilter(self)
+
+    def set_video(self, file_name):
+        if file_name == self.file_name:
+            return
+        self.thumbnails.cancel_pending()
+        self.file_name = file_name
+        self.keyframes = None
+        self._pixmaps.clear()
+        self._wanted = None
+        self._in_flight = None
+        self.popup.hide()
+
+    def position_at(self, x):
+        position = QStyle.sliderValueFromPosition(self.slider.minimum(), self.slider.maximum(), int(x),
+                                                  self.slider.width())
+        if self.keyframes:
+            return Keyframes.snap(self.keyframes, position)
+        return round(position / STEP_MS) * STEP_MS
+
+    def hover(self, x):
+        if not self.file_name or self.slider.maximum() <= 0:
+            return
+        position = self.position_at(x)
+        self.time.setText(Functions.change_position_into_time(position))
+        pixmap = self._pixmaps.get((self.file_name, position))
+        if pixmap is not None:
+            self.image.setPixmap(pixmap)
+            self._wanted = None
+        else:
+            # the previous frame stays up until this one is decoded
+            self._wanted = position
+            self._timer.start()
+        self.popup.adjustSize()
+        corner = self.slider.mapToGlobal(QPoint(int(x), 0))
+        self.popup.move(corner.x() - self.popup.width() // 2, corner.y() - self.popup.height() - 8)
+        self.popup.show()
+
+    def leave(self):
+        self._timer.stop()
+        self._wanted = None
+        self.popup.hide()
+
+    def request_wanted(self):
+        if self._wanted is None or self._in_flight is not None:
+            return
+        self._in_flight = self._wanted
+        self.thumbnails.request(self.file_name, self._in_flight, PREVIEW_WIDTH)
+
+    @Slot(str, int, int, bytes)
+    def thumbnail_ready(self, path, position, width, data):
+        if path != self.file_name or width != PREVIEW_WIDTH:
+            return
+        pixmap = QPixmap()
+        pixmap.loadFromData(data)
+        self._pixmaps.put((path, position), pixmap)
+        if position == self._wanted:
+            self.image.setPixmap(pixmap)
+            self._wanted = None
+        self._next(position)
+
+    @Slot(str, int, int)
+    def thumbnail_failed(self, path, position, width):
+        if path == self.file_name and width == PREVIEW_WIDTH:
+            if position == self._wanted:
+                self._wanted = None
+            self._next(position)
+
+    def _next(self, position):
+        if position == self._in_flight:
+            self._in_flight = None
+            if not self._timer.isActive():
+                self.request_wanted()
+
+    def shutdown(self):
+        self.leave()
+        self.thumbnails.shutdown()
+
+    def eventFilter(self, widget, event) -> bool:
+        if event.type() == QEvent.MouseMove:
+            self.hover(event.position().x())
+        elif event.type() in (QEvent.Leave, QEvent.Hide, QEvent.EnabledChange):
+            self.leave()
+        return super().eventFilter(widget, event)
+
+
+if __name__ == "__main__":
+    pass
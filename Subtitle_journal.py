@@ -0,0 +1,131 @@
+import json
+import os
+import threading
+import Subtitle_parser
+
+
+# subtitles whose journal is being written in this process, they are not recovered under the editor
+_open = set()
+# the main window and the editor may load the same file at once
+_recover_lock = threading.Lock()
+
+
+def journal_file(subtitle):
+    return subtitle + ".journal"
+
+
+def _base(st):
+    # the version of the subtitle file the edits apply to
+    return {"size": st.st_size, "mtime": st.st_mtime_ns}
+
+
+def _entry(row, start, end, text):
+    return json.dumps([row, start, end, text], ensure_ascii=False) + "\n"
+
+
+def read(subtitle):
+    """ return {row: (start, end, text)} of the journal of subtitle, None if there is none for this version of the file
+
+    rows keep their numbers across saves because the editor keeps the cues in start order,
+    so edits that are already in the file can be applied again without harm.
+    """
+    try:
+        f = open(journal_file(subtitle), encoding="utf-8")
+    except FileNotFoundError:
+        return None
+    base, matched, edits = _base(os.stat(subtitle)), False, {}
+    with f:
+        for line in f:
+            try:
+                item = json.loads(line)
+            except ValueError:
+                # a line cut short by a crash, nothing was written after it
+                break
+            if isinstance(item, dict):
+                matched = matched or item == base
+            else:
+                row, start, end, text = item
+                edits[row] = (start, end, text)
+    return edits if matched else None
+
+
+def recover(subtitle):
+    """ fold the journal left behind by a crash into the subtitle file, return True if there was one """
+    with _recover_lock:
+        if subtitle in _open or not os.path.exists(journal_file(subtitle)):
+            return False
+        edits = read(subtitle)
+        if edits is None:
+            print(subtitle + "   changed after its journal was written, the journal is dropped")
+        elif edits:
+            store = Subtitle_parser.load_file(subtitle)
+            Subtitle_parser.write_cues(subtitle, (edits.get(row) or (store.starts[row], store.ends[row], store.text(row))
+                                                  for row in range(len(store))))
+        os.remove(journal_file(subtitle))
+        return bool(edits)
+
+
+class edit_journal:
+    """ append-only log of the edits of one subtitle file, one line per edit """
+
+    def __init__(self, subtitle):
+        self.subtitle = subtitle
+        self.filename = journal_file(subtitle)
+        self._lock = threading.Lock()
+        self._file = None
+        # edits a crash left behind, when the file could not be recovered before it was loaded
+        self.recovered = read(subtitle) or {}
+        # entries written since the last compaction
+        self.pending = len(self.recovered)
+        self._rewrite(_base(os.stat(subtitle)), [_entry(row, *cue) for row, cue in sorted(self.recovered.items())])
+        with _recover_lock:
+            _open.add(subtitle)
+
+    def _rewrite(self, base, entries):
+        temporary = self.filename + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(json.dumps(base) + "\n")
+            f.writelines(entries)
+            f.flush()
+            os.fsync(f.fileno())
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+            os.replace(temporary, self.filename)
+            self._file = open(self.filename, "a", encoding="utf-8")
+
+    def _append(self, line):
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def record(self, row, start, end, text):
+        self._append(_entry(row, start, end, text))
+        self.pending += 1
+
+    def compact(self, cues):
+        """ write cues into the subtitle file, called from a background thread """
+        # the new version is announced before it replaces the file, so a crash in between still replays
+        Subtitle_parser.write_cues(self.subtitle, cues, before_replace=lambda st: self._append(json.dumps(_base(st)) + "\n"))
+
+    def compacted(self, count):
+        """ drop the first count entries, they are in the subtitle file now """
+        with open(self.filename, encoding="utf-8") as f:
+            entries = [line for line in f if line.startswith("[")]
+        self._rewrite(_base(os.stat(self.subtitle)), entries[count:])
+        self.pending -= count
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        _open.discard(self.subtitle)
+        # nothing left to replay
+        if self.pending == 0 and os.path.exists(self.filename):
+            os.remove(self.filename)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,216 @@
+import codecs
+import hashlib
+import locale
+import mmap
+import os
+import re
+import struct
+import sys
+from Cue_store import cue_store, iter_cues, parse_timestamp
+import Functions
+
+
+CACHE_DIR = os.path.join(os.path.split(os.path.realpath(__file__))[0], "Cache", "cues")
+# the arrays are written in the byte order of the machine, a cache from another one is not read
+CACHE_MAGIC = b"MYCUES2" + sys.byteorder[0].encode("ascii")
+# magic, size and mtime of the subtitle file, number of cues
+_HEADER = struct.Struct("<8sqqI4x")
+# the encoding is guessed from this many bytes at the start of the file
+SNIFF_BYTES = 65536
+# utf-16 files without a BOM are not guessed, the ones in the wild carry it
+# tried in order when a file is not utf-8 and not in the platform encoding, latin-1 decodes anything
+_FALLBACKS = ("gb18030", "cp1252", "latin-1")
+_BOMS = ((codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"))
+# the fields of a Dialogue line when the [Events] section has no Format line
+_ASS_FIELDS = [b"layer", b"start", b"end", b"style", b"name", b"marginl", b"marginr", b"marginv", b"effect", b"text"]
+_ASS_OVERRIDE = re.compile(rb"{[^}]*}")
+
+
+def sniff_encoding(head):
+    """ the encoding of a file that starts with head: from its BOM, else the first of utf-8,
+    the platform default and the fallbacks that decodes head without errors
+    """
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding
+    for encoding in ("utf-8", locale.getpreferredencoding(False)) + _FALLBACKS:
+        try:
+            # not final, a character cut at the end of head is fine
+            codecs.getincrementaldecoder(encoding)().decode(head)
+            return encoding
+        except (UnicodeDecodeError, LookupError):
+            continue
+
+
+def iter_file_lines(filename):
+    """ yield the lines of the file as utf-8 bytes, a utf-8 file is read from a memory map without decoding it """
+    if os.path.getsize(filename) == 0:
+        return
+    with open(filename, "rb") as f:
+        encoding = sniff_encoding(f.read(SNIFF_BYTES))
+        if codecs.lookup(encoding).name == "utf-8":
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                first = mm.readline()
+                # drop the utf-8 BOM some editors write
+                yield first[3:] if first.startswith(codecs.BOM_UTF8) else first
+                yield from iter(mm.readline, b"")
+            return
+    with open(filename, "r", encoding=encoding, errors="replace") as f:
+        for line in f:
+            yield line.encode("utf-8")
+
+
+def iter_ass_cues(lines):
+    """ read the lines (bytes) of an .ass/.ssa file once, yield (start, end, text) of its Dialogue events """
+    fields = _ASS_FIELDS
+    in_events = False
+    for line in lines:
+        line = line.strip()
+        if line.startswith(b"["):
+            in_events = line.lower() == b"[events]"
+            continue
+        if not in_events:
+            continue
+        key, _, value = line.partition(b":")
+        if key == b"Format":
+            fields = [field.strip().lower() for field in value.split(b",")]
+        elif key == b"Dialogue":
+            # only the last field, the text, may contain commas
+            event = dict(zip(fields, value.split(b",", len(fields) - 1)))
+            start = parse_timestamp(event.get(b"start", b"").decode("ascii", "replace"))
+            end = parse_timestamp(event.get(b"end", b"").decode("ascii", "replace"))
+            text = _ASS_OVERRIDE.sub(b"", event.get(b"text", b"").strip())
+            text = text.replace(b"\\N", b"\n").replace(b"\\n", b"\n").replace(b"\\h", b" ").strip()
+            if start is not None and end is not None and text:
+                yield start, end, text
+
+
+# the parser of each subtitle format, they all yield (start ms, end ms, utf-8 text)
+PARSERS = {".vtt": iter_cues, ".srt": iter_cues, ".ass": iter_ass_cues, ".ssa": iter_ass_cues}
+
+
+def parser_for(filename):
+    return PARSERS.get(os.path.splitext(filename)[1].lower(), iter_cues)
+
+
+def load_batches(filename, batch_size=2000):
+    """ parse the subtitle file in one pass, yield cue_store batches of at most batch_size cues """
+    batch = cue_store()
+    streaming, last_start = True, None
+    for start, end, text in parser_for(filename)(iter_file_lines(filename)):
+        # a cue before the ones already sent would make the receiver sort again on every
+        # following batch, so the rest of the file comes as one batch and is sorted once
+        if streaming and last_start is not None and start < last_start:
+            streaming = False
+        batch.append(start, end, text)
+        if streaming and len(batch) >= batch_size:
+            batch.sort()
+            last_start = batch.starts[-1]
+            yield batch
+            batch = cue_store()
+    if batch:
+        batch.sort()
+        yield batch
+
+
+def load_file(filename):
+    """ parse the whole subtitle file into one cue_store """
+    store = cue_store()
+    for batch in load_batches(filename):
+        store.extend(batch)
+    return store
+
+
+def cache_file(filename):
+    return os.path.join(CACHE_DIR, hashlib.sha1(os.path.abspath(filename).encode("utf-8")).hexdigest() + ".cues")
+
+
+def load_cached(filename):
+    """ the cues of filename mapped read-only from the cache, None if the cache is not of this version of the file
+
+    the pages of the map come from the OS file cache, so every player that opens the file shares them.
+    """
+    st = os.stat(filename)
+    try:
+        f = open(cache_file(filename), "rb")
+    except FileNotFoundError:
+        return None
+    with f:
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            return None
+        magic, size, mtime, count = _HEADER.unpack(header)
+        if (magic, size, mtime) != (CACHE_MAGIC, st.st_size, st.st_mtime_ns):
+            return None
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(mm) < _HEADER.size + 16 * count + 4:
+        return None
+    return cue_store.from_buffer(mm, _HEADER.size, count)
+
+
+def write_cache(filename, store, st):
+    """ cache the cues of filename, st is its os.stat from before it was parsed """
+    target = cache_file(filename)
+    temporary = target + ".tmp"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(temporary, "wb") as f:
+            f.write(_HEADER.pack(CACHE_MAGIC, st.st_size, st.st_mtime_ns, len(store)))
+            store.write_to(f)
+        os.replace(temporary, target)
+    except OSError as e:
+        # another player may have the old cache mapped, that one stays until next time
+        print(filename + "   can not be cached: " + str(e))
+
+
+def load_batches_cached(filename, batch_size=2000):
+    """ like load_batches, a cached file comes back as one mapped batch and a parsed one is cached at the end """
+    cached = load_cached(filename)
+    if cached is not None:
+        yield cached
+        return
+    st = os.stat(filename)
+    store = cue_store()
+    for batch in load_batches(filename, batch_size):
+        store.extend(batch)
+        yield batch
+    write_cache(filename, store, st)
+
+
+def _write_vtt(f, cues):
+    f.write("WEBVTT\n\n")
+    for start, end, text in cues:
+        f.write(f"{Functions.change_position_into_time(start)} --> {Functions.change_position_into_time(end)}\n"
+                f"{text}\n\n")
+
+
+def _write_srt(f, cues):
+    for i, (start, end, text) in enumerate(cues, 1):
+        f.write(f"{i}\n{Functions.change_position_into_time(start).replace('.', ',')} --> "
+                f"{Functions.change_position_into_time(end).replace('.', ',')}\n{text}\n\n")
+
+
+# .ass files keep styles the cues do not have, they are not written back
+WRITERS = {".vtt": _write_vtt, ".srt": _write_srt}
+
+
+def writable(filename):
+    return os.path.splitext(filename)[1].lower() in WRITERS
+
+
+def write_cues(filename, cues, before_replace=None):
+    """ write (start, end, text) cues to filename one by one in the format of its extension,
+    the file is replaced only when it is complete
+
+    before_replace gets the os.stat of the complete file, the renamed file keeps it.
+    """
+    temporary = filename + ".tmp"
+    with open(temporary, "w", encoding="utf-8", newline="\n") as f:
+        WRITERS[os.path.splitext(filename)[1].lower()](f, cues)
+    if before_replace is not None:
+        before_replace(os.stat(temporary))
+    os.replace(temporary, filename)
+
+
+if __name__ == "__main__":
+    pass
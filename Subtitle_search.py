@@ -0,0 +1,130 @@
+import os
+import Database
+import Functions
+import Subtitle_parser
+
+
+# cue rowids are FILE_ID << CUE_BITS | cue index, so the cues of one file are one rowid range
+CUE_BITS = 20
+# phrases of at least this many characters are found through the trigram index, shorter ones through the pairs
+TRIGRAM = 3
+# a single character is in too many cues to be worth a search
+MIN_PHRASE = 2
+
+
+def create_table():
+    Database.execute('''CREATE TABLE IF NOT EXISTS SUBTITLE_FILE
+                (ID    INTEGER PRIMARY KEY,
+                    PATH  TEXT NOT NULL UNIQUE,
+                    VIDEO TEXT NOT NULL,
+                    SIZE  INT  NOT NULL,
+                    MTIME INT  NOT NULL);''')
+    # START and END are in ms, like Functions.change_time_into_position returns them.
+    # the trigram tokenizer matches any substring, also in Chinese or Japanese lines without spaces
+    Database.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS SUBTITLE_FTS
+                USING fts5(TEXT, START UNINDEXED, END UNINDEXED, tokenize='trigram');''')
+    # a trigram index can not answer a two character phrase like "北京", this one holds the character
+    # pairs of every cue as words, under the rowid of the cue
+    Database.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS SUBTITLE_PAIRS
+                USING fts5(PAIRS);''')
+
+
+def pairs(text):
+    """ the neighbouring characters of text as words, "去北京" gives "去北 北京" in any order """
+    text = text.lower()
+    return " ".join({text[i:i + 2] for i in range(len(text) - 1)
+                     if not (text[i].isspace() or text[i + 1].isspace())})
+
+
+def _cue_range(file_id):
+    return file_id << CUE_BITS, ((file_id + 1) << CUE_BITS) - 1
+
+
+def index_file(subtitle, video):
+    """ (re)index the cues of one subtitle file, nothing is done if it did not change since the last time """
+    st = os.stat(subtitle)
+    row = Database.fetchone("SELECT ID, SIZE, MTIME FROM SUBTITLE_FILE WHERE PATH = ?", (subtitle,))
+    if row is not None and row[1:] == (st.st_size, st.st_mtime_ns):
+        return False
+    if row is None:
+        # size and mtime are only set once the cues are in, an interrupted run is redone next time
+        Database.execute("INSERT INTO SUBTITLE_FILE (PATH, VIDEO, SIZE, MTIME) VALUES (?, ?, -1, -1)",
+                         (subtitle, video))
+        file_id = Database.fetchone("SELECT ID FROM SUBTITLE_FILE WHERE PATH = ?", (subtitle,))[0]
+    else:
+        file_id = row[0]
+    Functions.sqlite_update("DELETE FROM SUBTITLE_FTS WHERE rowid BETWEEN ? AND ?", _cue_range(file_id))
+    Functions.sqlite_update("DELETE FROM SUBTITLE_PAIRS WHERE rowid BETWEEN ? AND ?", _cue_range(file_id))
+    first, last = _cue_range(file_id)
+    rowid = first
+    for batch in Subtitle_parser.load_batches(subtitle, batch_size=5000):
+        rows = []
+        for i in range(len(batch)):
+            if rowid > last:
+                print(subtitle + "   has too many cues, the rest is not searchable")
+                break
+            rows.append((rowid, batch.text(i), batch.starts[i], batch.ends[i]))
+            rowid += 1
+        Database.submit_many("INSERT INTO SUBTITLE_FTS (rowid, TEXT, START, END) VALUES (?, ?, ?, ?)", rows)
+        Database.submit_many("INSERT INTO SUBTITLE_PAIRS (rowid, PAIRS) VALUES (?, ?)",
+                             [(row[0], pairs(row[1])) for row in rows])
+    Functions.sqlite_update("UPDATE SUBTITLE_FILE SET VIDEO = ?, SIZE = ?, MTIME = ? WHERE ID = ?",
+                            (video, st.st_size, st.st_mtime_ns, file_id))
+    return True
+
+
+def remove_file(subtitle):
+    row = Database.fetchone("SELECT ID FROM SUBTITLE_FILE WHERE PATH = ?", (subtitle,))
+    if row is not None:
+        Functions.sqlite_update("DELETE FROM SUBTITLE_FTS WHERE rowid BETWEEN ? AND ?", _cue_range(row[0]))
+        Functions.sqlite_update("DELETE FROM SUBTITLE_PAIRS WHERE rowid BETWEEN ? AND ?", _cue_range(row[0]))
+        Functions.sqlite_update("DELETE FROM SUBTITLE_FILE WHERE ID = ?", (row[0],))
+
+
+def index_library(progress=None, cancelled=None):
+    """ index every sidecar of the library that is new or changed, forget the ones that are gone """
+    subtitles = Functions.sqlite_fetch("SELECT SUBTITLE, PATH FROM LIBRARY WHERE SUBTITLE != ''")
+    wanted = {subtitle for subtitle, _ in subtitles}
+    for (path,) in Functions.sqlite_fetch("SELECT PATH FROM SUBTITLE_FILE"):
+        if path not in wanted:
+            remove_file(path)
+    changed = 0
+    for i, (subtitle, video) in enumerate(subtitles):
+        if cancelled is not None and cancelled():
+            break
+        try:
+            changed += index_file(subtitle, video)
+        except OSError as e:
+            print(subtitle + "   can not be indexed: " + str(e))
+        if progress is not None and (i % 64 == 0 or i == len(subtitles) - 1):
+            progress(i + 1, len(subtitles), changed)
+    Database.flush()
+    return changed
+
+
+def search(phrase, limit=200):
+    """ return [(video, start, end, text)] of the cues containing phrase, in file and time order
+
+    ranking would score every match before the limit applies, the rowid order lets FTS5 stop early.
+    phrases shorter than MIN_PHRASE find nothing.
+    """
+    phrase = phrase.strip()
+    if len(phrase) < MIN_PHRASE:
+        return []
+    # the phrase is quoted so FTS5 operators typed by the user are taken literally
+    query = '"' + phrase.replace('"', '""') + '"'
+    if len(phrase) >= TRIGRAM:
+        return Functions.sqlite_fetch('''SELECT f.VIDEO, s.START, s.END, s.TEXT FROM SUBTITLE_FTS s
+                                      JOIN SUBTITLE_FILE f ON f.ID = (s.rowid >> ?)
+                                      WHERE SUBTITLE_FTS MATCH ? LIMIT ?''', (CUE_BITS, query, limit))
+    # the pair index finds the cues, LIKE drops the few where punctuation split the pair into two words
+    like = "%" + phrase.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    return Functions.sqlite_fetch('''SELECT f.VIDEO, s.START, s.END, s.TEXT FROM SUBTITLE_PAIRS p
+                                  JOIN SUBTITLE_FTS s ON s.rowid = p.rowid
+                                  JOIN SUBTITLE_FILE f ON f.ID = (s.rowid >> ?)
+                                  WHERE SUBTITLE_PAIRS MATCH ? AND s.TEXT LIKE ? ESCAPE '\\' LIMIT ?''',
+                                  (CUE_BITS, query, like, limit))
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,154 @@
+import hashlib
+from collections import OrderedDict
+import os
+import subprocess
+import threading
+
+
+BASE_DIR = os.path.split(os.path.realpath(__file__))[0]
+CACHE_DIR = os.path.join(BASE_DIR, "Cache", "thumbnails")
+# 256 MB of thumbnails at most, the least recently used ones are removed first
+CACHE_LIMIT = 256 * 1024 * 1024
+
+
+def extract_frame(ffmpeg, path, position, width):
+    """ decode the frame at position (ms) scaled to width, return it as jpeg bytes, b"" if it fails
+
+    it is a plain function so it can run in a process pool.
+    """
+    try:
+        return subprocess.run([ffmpeg, "-v", "error", "-ss", f"{position / 1000:.3f}", "-i", path,
+                               "-frames:v", "1", "-vf", f"scale={width}:-2", "-c:v", "mjpeg", "-q:v", "5",
+                               "-f", "image2pipe", "-"],
+                              capture_output=True, timeout=30).stdout
+    except (OSError, subprocess.TimeoutExpired):
+        return b""
+
+
+def file_key(path, size, mtime):
+    """ the cache folder name of a video, a changed file gets a new key """
+    return hashlib.sha1(f"{path}|{size}|{mtime}".encode("utf-8")).hexdigest()
+
+
+class thumbnail_cache:
+    """ jpeg thumbnails on disk, bounded by size and evicted by least recent use
+
+    the file mtime is the last use time, so the order survives restarts.
+    """
+
+    def __init__(self, directory=CACHE_DIR, limit=CACHE_LIMIT):
+        self.directory = directory
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._index = None  # filename -> [last use, size]
+        self._total = 0
+
+    def _load_index(self):
+        if self._index is not None:
+            return
+        self._index = {}
+        os.makedirs(self.directory, exist_ok=True)
+        for folder in os.scandir(self.directory):
+            if not folder.is_dir():
+                continue
+            for entry in os.scandir(folder.path):
+                st = entry.stat()
+                self._index[entry.path] = [st.st_mtime, st.st_size]
+                self._total += st.st_size
+
+    def _filename(self, key, position, width):
+        return os.path.join(self.directory, key, f"{position}_{width}.jpg")
+
+    def get(self, key, position, width):
+        filename = self._filename(key, position, width)
+        with self._lock:
+            self._load_index()
+            entry = self._index.get(filename)
+            if entry is None:
+                return None
+            try:
+                with open(filename, "rb") as f:
+                    data = f.read()
+                os.utime(filename)
+            except OSError:
+                self._total -= self._index.pop(filename)[1]
+                return None
+            entry[0] = os.path.getmtime(filename)
+            return data
+
+    def put(self, key, position, width, data):
+        if not data:
+            return
+        filename = self._filename(key, position, width)
+        with self._lock:
+            self._load_index()
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            # write and rename, a half written thumbnail is never seen
+            with open(filename + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(filename + ".tmp", filename)
+            if filename in self._index:
+                self._total -= self._index[filename][1]
+            self._index[filename] = [os.path.getmtime(filename), len(data)]
+            self._total += len(data)
+            if self._total > self.limit:
+                self._evict()
+
+    def _evict(self):
+        # drop down to 90% of the limit so the next writes do not evict again at once
+        for filename, (_, size) in sorted(self._index.items(), key=lambda item: item[1][0]):
+            if self._total <= self.limit * 0.9:
+                break
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+            del self._index[filename]
+            self._total -= size
+
+
+_shared = None
+
+
+def shared_cache():
+    """ the one thumbnail_cache of the process, its index is read once for every service """
+    global _shared
+    if _shared is None:
+        _shared = thumbnail_cache()
+    return _shared
+
+
+class memory_lru:
+    """ the count most recently used values in memory, e.g. decoded pixmaps """
+
+    def __init__(self, count):
+        self.count = count
+        self._items = OrderedDict()
+
+    def get(self, key):
+        value = self._items.get(key)
+        if value is not None:
+            self._items.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.count:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self._items.clear()
+
+
+def level_position(duration, level, index, base_count=16):
+    """ the position of thumbnail index at a zoom level, every level doubles the count and keeps the previous positions """
+    return duration * index // (base_count * 2 ** level)
+
+
+def level_positions(duration, level, base_count=16):
+    return [level_position(duration, level, i, base_count) for i in range(base_count * 2 ** level)]
+
+
+if __name__ == "__main__":
+    pass
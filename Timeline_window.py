@@ -1,10 +1,53 @@
-from PySide6.QtWidgets import QWidget, QGraphicsView
-from PySide6 import QtCharts
-from PySide6.QtGui import QIcon
+from PySide6.QtWidgets import QWidget, QGraphicsView, QGraphicsScene, QVBoxLayout
+from PySide6.QtGui import QIcon, QPixmap, QColor, QPainter
+from PySide6.QtCore import Qt, QEvent, QLineF
+from Workers import thumbnail_service, waveform_loader
+import Thumbnail
 import Functions
-import sqlite3
 import os
 
+# width of one thumbnail in the strip, and the deepest zoom level
+THUMB_WIDTH = 160
+THUMB_HEIGHT = 90
+MAX_LEVEL = 8
+WAVE_HEIGHT = 60
+# thumbnails requested on each side of the visible part of the strip
+MARGIN = 4
+
+
+class waveform_view(QWidget):
+    """ min/max audio peaks of the part of the video visible in the strip """
+
+    def __init__(self):
+        super().__init__()
+        self.setFixedHeight(WAVE_HEIGHT)
+        self.levels = []
+        self.start = 0
+        self.end = 0
+
+    def set_levels(self, levels):
+        self.levels = levels
+        self.update()
+
+    def set_range(self, start, end):
+        self.start = start
+        self.end = end
+        self.update()
+
+    def paintEvent(self, event) -> None:
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(10, 10, 10))
+        if not self.levels:
+            return
+        import Waveform
+        mins, maxs = Waveform.peaks_for(self.levels, self.start, self.end, self.width())
+        middle = self.height() / 2
+        scale = middle / 32768
+        painter.setPen(QColor(90, 200, 120))
+        painter.drawLines([QLineF(x, middle - int(high) * scale, x, middle - int(low) * scale)
+                           for x, (low, high) in enumerate(zip(mins, maxs))])
+
+
 class timeline_window(QWidget):
     def __init__(self):
         super().__init__()
@@ -12,29 +55,172 @@ class timeline_window(QWidget):
         # set title for the window
         self.setWindowTitle("timeline")
         self.setWindowIcon(QIcon('.\\Icon\\timeline_editor.png'))
-        
+
         if os.path.exists('data.db'):
             self.load_location()
         else:
             print("Files missed!")
 
+        # current video
+        self.file_name = ""
+        self.duration = 0
+        # zoom level, level n shows 16 * 2^n thumbnails
+        self.level = 0
+        # decoded thumbnails of the current video, position -> QPixmap
+        self._pixmaps = {}
+        self._items = {}
+        # the thumbnail positions of the strip, and the ones asked for since it was built
+        self._positions = []
+        self._requested = set()
+
+        # thumbnail strip
+        self.scene = QGraphicsScene(self)
+        self.scene.setBackgroundBrush(QColor(10, 10, 10))
+        self.strip = QGraphicsView(self.scene)
+        self.strip.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
+        self.strip.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.strip.setAlignment(Qt.AlignLeft | Qt.AlignTop)
+        self.strip.setToolTip("ctrl + wheel to zoom")
+        self.strip.viewport().installEventFilter(self)
+
+        self.thumbnails = thumbnail_service(self)
+        self.thumbnails.thumbnail_ready.connect(self.add_thumbnail)
+
+        # audio overview under the strip, it follows the scrolling and zooming of the strip
+        self.waveform = waveform_view()
+        self._waveform_loader = None
+        self.strip.horizontalScrollBar().valueChanged.connect(self.update_waveform_range)
+        self.strip.horizontalScrollBar().valueChanged.connect(self.request_visible)
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
+        layout.addWidget(self.strip)
+        layout.addWidget(self.waveform)
+        self.setLayout(layout)
+
+    def set_video(self, file_name, duration):
+        """ show the strip of another video, duration in ms """
+        if file_name == self.file_name and duration == self.duration:
+            return
+        self.thumbnails.cancel_pending()
+        self.file_name = file_name
+        self.duration = duration
+        self.level = 0
+        self._pixmaps = {}
+        self.build_strip()
+        self.waveform.set_levels([])
+        self._stop_waveform_loader()
+        if file_name:
+            self._waveform_loader = waveform_loader(file_name, self)
+            self._waveform_loader.waveform_ready.connect(self.add_waveform)
+            self._waveform_loader.start()
+
+    def _stop_waveform_loader(self):
+        if self._waveform_loader is not None:
+            self._waveform_loader.requestInterruption()
+            self._waveform_loader.wait()
+            self._waveform_loader.deleteLater()
+            self._waveform_loader = None
+
+    def shutdown(self):
+        """ stop the decoding behind the strip and the waveform, the window is not shown again """
+        self._stop_waveform_loader()
+        self.thumbnails.shutdown()
+
+    def add_waveform(self, path, levels):
+        if path == self.file_name:
+            self.waveform.set_levels(levels)
+            self.update_waveform_range()
+
+    def update_waveform_range(self):
+        width = self.scene.sceneRect().width()
+        if width <= 0:
+            return
+        left = self.strip.mapToScene(0, 0).x()
+        right = left + self.strip.viewport().width()
+        self.waveform.set_range(int(left / width * self.duration), int(min(right, width) / width * self.duration))
+
+    def build_strip(self):
+        self.scene.clear()
+        self._items = {}
+        self._positions = []
+        self._requested = set()
+        if not self.file_name or self.duration <= 0:
+            return
+        self._positions = Thumbnail.level_positions(self.duration, self.level)
+        for i, position in enumerate(self._positions):
+            item = self.scene.addPixmap(self._best_pixmap(i))
+            item.setPos(i * THUMB_WIDTH, 0)
+            item.setToolTip(Functions.change_position_into_time(position))
+            self._items[position] = item
+        self.scene.setSceneRect(0, 0, len(self._positions) * THUMB_WIDTH, THUMB_HEIGHT)
+        self.request_visible()
+
+    def _best_pixmap(self, index):
+        # until the thumbnail of this level is decoded, show the one of a coarser level
+        for coarser in range(self.level, -1, -1):
+            position = Thumbnail.level_position(self.duration, coarser, index >> (self.level - coarser))
+            if position in self._pixmaps:
+                return self._pixmaps[position]
+        return QPixmap()
+
+    def request_visible(self):
+        """ ask for the thumbnails of the visible part of the strip and a few next to it, the middle first """
+        if not self._positions:
+            return
+        left = self.strip.mapToScene(0, 0).x() / THUMB_WIDTH
+        right = left + self.strip.viewport().width() / THUMB_WIDTH
+        first = max(0, int(left) - MARGIN)
+        last = min(len(self._positions), int(right) + 1 + MARGIN)
+        center = (left + right) / 2
+        for i in sorted(range(first, last), key=lambda i: abs(i - center)):
+            position = self._positions[i]
+            if position not in self._pixmaps and position not in self._requested:
+                self._requested.add(position)
+                self.thumbnails.request(self.file_name, position, THUMB_WIDTH)
+
+    def add_thumbnail(self, path, position, width, data):
+        if path != self.file_name or width != THUMB_WIDTH:
+            return
+        pixmap = QPixmap()
+        pixmap.loadFromData(data)
+        self._pixmaps[position] = pixmap
+        if position in self._items:
+            self._items[position].setPixmap(pixmap)
+
+    def zoom(self, steps):
+        level = min(MAX_LEVEL, max(0, self.level + steps))
+        if level == self.level:
+            return
+        # keep the same moment under the middle of the view
+        center = self.strip.mapToScene(self.strip.viewport().rect().center()).x()
+        self.thumbnails.cancel_pending()
+        scale = 2 ** (level - self.level)
+        self.level = level
+        self.build_strip()
+        self.strip.centerOn(center * scale, THUMB_HEIGHT / 2)
+        self.update_waveform_range()
+        # build_strip asked for the part that was visible before centerOn
+        self.request_visible()
+
+    def eventFilter(self, widget, event) -> bool:
+        if event.type() == QEvent.Wheel and event.modifiers() & Qt.ControlModifier:
+            self.zoom(1 if event.angleDelta().y() > 0 else -1)
+            return True
+        if event.type() == QEvent.Resize:
+            self.request_visible()
+        return super().eventFilter(widget, event)
+
     def closeEvent(self, event) -> None:
-        # save mainwindow's location to database
-        sql = f'''UPDATE TIMELINE_WINDOW SET ID = 1, X = {self.x()}, Y = {self.y()}, Width = {self.width()}, Height = {self.height()};'''
-        Functions.sqlite_update(sql)
+        # save the window's location to database
+        Functions.save_window_location(self, "TIMELINE_WINDOW")
         print("The position of the timeline window is saved!")
         return super().closeEvent(event)
 
     def load_location(self):
-        conn = sqlite3.connect('data.db')
-        c = conn.cursor()
-        c.execute("SELECT X, Y, Width, Height from TIMELINE_WINDOW")
-        data = c.fetchall()
-        self.move(data[0][0], data[0][1])
-        self.resize(data[0][2], data[0][3])
-        conn.commit()
-        conn.close()
+        Functions.load_window_location(self, "TIMELINE_WINDOW")
 
 
 if __name__ == "__main__":
-    pass
\ No newline at end of file
+    pass
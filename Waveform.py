@@ -0,0 +1,122 @@
+import os
+import subprocess
+import numpy as np
+import Media_probe
+import Thumbnail
+
+
+CACHE_DIR = os.path.join(Thumbnail.BASE_DIR, "Cache", "waveforms")
+# audio is decoded as mono 16 bit at this rate, plenty for an overview
+SAMPLE_RATE = 8000
+# samples per bucket of the finest level
+BUCKET = 64
+# decoded in chunks of this many seconds, memory does not grow with the length of the file
+CHUNK_SECONDS = 30
+
+
+def iter_audio_chunks(path, rate=SAMPLE_RATE, chunk_seconds=CHUNK_SECONDS):
+    """ decode the audio of path with ffmpeg and yield it as int16 numpy chunks """
+    ffmpeg = Media_probe.ffmpeg_binary()
+    if ffmpeg is None:
+        raise OSError("ffmpeg is not found")
+    process = subprocess.Popen([ffmpeg, "-v", "error", "-i", path, "-vn", "-ac", "1", "-ar", str(rate),
+                                "-f", "s16le", "-"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    chunk_bytes = rate * chunk_seconds * 2
+    try:
+        while True:
+            data = process.stdout.read(chunk_bytes)
+            if not data:
+                break
+            yield np.frombuffer(data[:len(data) - len(data) % 2], dtype=np.int16)
+    finally:
+        process.stdout.close()
+        process.kill()
+        process.wait()
+
+
+def _halve(mins, maxs):
+    # one level up the pyramid, every bucket covers two buckets of the level below
+    if len(mins) % 2:
+        mins = np.append(mins, mins[-1])
+        maxs = np.append(maxs, maxs[-1])
+    return np.minimum(mins[0::2], mins[1::2]), np.maximum(maxs[0::2], maxs[1::2])
+
+
+def build_pyramid(chunks, bucket=BUCKET, cancelled=None):
+    """ reduce the audio chunks to min/max peaks per bucket, then halve them until one bucket is left
+
+    return a list of (mins, maxs) int16 arrays, level n has buckets of bucket * 2^n samples.
+    None if cancelled() turned true on the way.
+    """
+    mins, maxs = [], []
+    rest = np.zeros(0, dtype=np.int16)
+    for chunk in chunks:
+        if cancelled is not None and cancelled():
+            return None
+        samples = np.concatenate((rest, chunk)) if len(rest) else chunk
+        usable = len(samples) - len(samples) % bucket
+        block = samples[:usable].reshape(-1, bucket)
+        mins.append(block.min(axis=1))
+        maxs.append(block.max(axis=1))
+        rest = samples[usable:]
+    if len(rest):
+        mins.append(rest.min(keepdims=True))
+        maxs.append(rest.max(keepdims=True))
+    if not mins:
+        return []
+    levels = [(np.concatenate(mins), np.concatenate(maxs))]
+    while len(levels[-1][0]) > 1:
+        levels.append(_halve(*levels[-1]))
+    return levels
+
+
+def cache_file(path):
+    return os.path.join(CACHE_DIR, Thumbnail.file_key(path, *Media_probe.file_identity(path)) + ".npz")
+
+
+def load_pyramid(path, cancelled=None):
+    """ the peak pyramid of path, read from the cache or decoded once and cached, None if cancelled """
+    filename = cache_file(path)
+    if os.path.isfile(filename):
+        with np.load(filename) as data:
+            return [(data[f"min{i}"], data[f"max{i}"]) for i in range(len(data.files) // 2)]
+    chunks = iter_audio_chunks(path)
+    try:
+        levels = build_pyramid(chunks, cancelled=cancelled)
+    finally:
+        # stops ffmpeg at once when the build was cancelled half way
+        chunks.close()
+    if levels is None:
+        return None
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    arrays = {}
+    for i, (mins, maxs) in enumerate(levels):
+        arrays[f"min{i}"] = mins
+        arrays[f"max{i}"] = maxs
+    # np.savez adds .npz to a name without it, so the temporary name keeps the suffix
+    np.savez(filename[:-4] + ".tmp.npz", **arrays)
+    os.replace(filename[:-4] + ".tmp.npz", filename)
+    return levels
+
+
+def peaks_for(levels, start, end, columns, rate=SAMPLE_RATE, bucket=BUCKET):
+    """ min/max peaks of [start, end) ms spread over columns, from the coarsest level that is still fine enough """
+    if not levels or columns <= 0 or end <= start:
+        return np.zeros(0, dtype=np.int16), np.zeros(0, dtype=np.int16)
+    samples_per_column = (end - start) * rate / 1000 / columns
+    level = 0
+    while level + 1 < len(levels) and bucket * 2 ** (level + 1) <= samples_per_column:
+        level += 1
+    mins, maxs = levels[level]
+    size = bucket * 2 ** level
+    first = int(start * rate / 1000 / size)
+    last = min(len(mins), int(np.ceil(end * rate / 1000 / size)))
+    if first >= last:
+        return np.zeros(0, dtype=np.int16), np.zeros(0, dtype=np.int16)
+    edges = np.linspace(first, last, columns + 1).astype(np.int64)
+    edges = np.minimum(edges[:-1], last - 1)
+    return np.minimum.reduceat(mins[:last], edges), np.maximum.reduceat(maxs[:last], edges)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,269 @@
+from PySide6.QtCore import QObject, QThread, Signal
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import os
+import threading
+import Subtitle_parser
+import Subtitle_journal
+import Media_probe
+import Thumbnail
+import Library
+import Subtitle_search
+import Keyframes
+
+
+class subtitle_loader(QThread):
+    """ parse a subtitle file off the UI thread, the cues are sent back in batches """
+    cues_parsed = Signal(object)  # a cue_store batch
+    parse_failed = Signal(str)
+
+    def __init__(self, filename, parent=None):
+        super().__init__(parent)
+        self.filename = filename
+
+    def run(self):
+        try:
+            # edits a crash left in the journal are put into the file before it is read
+            Subtitle_journal.recover(self.filename)
+            for batch in Subtitle_parser.load_batches_cached(self.filename):
+                if self.isInterruptionRequested():
+                    return
+                self.cues_parsed.emit(batch)
+        except OSError as e:
+            self.parse_failed.emit(str(e))
+
+
+class journal_compactor(QThread):
+    """ write the edited cues into the subtitle file while editing goes on """
+    compacted = Signal(int)  # number of journal entries that are in the file now
+
+    def __init__(self, journal, cues, count, parent=None):
+        super().__init__(parent)
+        self.journal = journal
+        self.cues = cues
+        self.count = count
+
+    def run(self):
+        try:
+            self.journal.compact(self.cues)
+        except OSError as e:
+            print(self.journal.subtitle + "   can not be saved: " + str(e))
+            return
+        self.compacted.emit(self.count)
+
+
+class waveform_loader(QThread):
+    """ build or load the audio peak pyramid of a media file """
+    waveform_ready = Signal(str, object)  # path, list of (mins, maxs)
+
+    def __init__(self, filename, parent=None):
+        super().__init__(parent)
+        self.filename = filename
+
+    def run(self):
+        # numpy is only loaded once a waveform is really needed
+        import Waveform
+        try:
+            levels = Waveform.load_pyramid(self.filename, self.isInterruptionRequested)
+        except (OSError, ValueError) as e:
+            print(self.filename + "   has no waveform: " + str(e))
+            return
+        if levels is not None and not self.isInterruptionRequested():
+            self.waveform_ready.emit(self.filename, levels)
+
+
+class autosync_worker(QThread):
+    """ estimate how far the cues of a subtitle are off the voices of the media file """
+    synced = Signal(str, str, object)  # media path, subtitle path, (offset ms, factor, score)
+    sync_failed = Signal(str, str)  # media path, reason
+
+    def __init__(self, filename, subtitle_filename, starts, ends, parent=None):
+        super().__init__(parent)
+        self.filename = filename
+        self.subtitle_filename = subtitle_filename
+        # copies of the cue times, the store may be replaced while this runs
+        self.starts = starts
+        self.ends = ends
+
+    def run(self):
+        import numpy as np
+        import Waveform
+        import Autosync
+        try:
+            envelope = Autosync.voice_envelope(Waveform.iter_audio_chunks(self.filename),
+                                               cancelled=self.isInterruptionRequested)
+            if envelope is None or self.isInterruptionRequested():
+                return
+            result = Autosync.estimate(envelope, np.frombuffer(self.starts, dtype=np.int32),
+                                       np.frombuffer(self.ends, dtype=np.int32))
+        except (OSError, ValueError) as e:
+            # without a signal the editor would wait for the result forever
+            self.sync_failed.emit(self.filename, str(e))
+            return
+        if not self.isInterruptionRequested():
+            self.synced.emit(self.filename, self.subtitle_filename, result)
+
+
+class keyframe_loader(QThread):
+    """ build or load the keyframe index of a media file """
+    keyframes_ready = Signal(str, object)  # path, array of keyframe times in ms
+
+    def __init__(self, filename, parent=None):
+        super().__init__(parent)
+        self.filename = filename
+
+    def run(self):
+        try:
+            times = Keyframes.load(self.filename, self.isInterruptionRequested)
+        except OSError as e:
+            print(self.filename + "   has no keyframe index: " + str(e))
+            return
+        if times is not None and not self.isInterruptionRequested():
+            self.keyframes_ready.emit(self.filename, times)
+
+
+class library_scanner(QThread):
+    """ walk the library folders in the background and index new or changed videos """
+    progress = Signal(int, int, int)  # directories, videos, changed
+    indexing = Signal(int, int, int)  # subtitles checked, subtitles, reindexed
+    scanned = Signal(object)  # the summary dict of the last root
+
+    def __init__(self, roots, parent=None):
+        super().__init__(parent)
+        self.roots = roots
+
+    def run(self):
+        summary = {}
+        for root in self.roots:
+            if self.isInterruptionRequested():
+                break
+            summary = Library.scan(root, progress=self.progress.emit, cancelled=self.isInterruptionRequested)
+        # then the sidecars that are new or changed go into the full-text index
+        if not self.isInterruptionRequested():
+            summary["subtitles"] = Subtitle_search.index_library(progress=self.indexing.emit,
+                                                                 cancelled=self.isInterruptionRequested)
+        self.scanned.emit(summary)
+
+
+class subtitle_searcher(QThread):
+    """ search the subtitles of the library off the UI thread """
+    found = Signal(str, object)  # phrase, list of (video, start, end, text)
+
+    def __init__(self, phrase, parent=None):
+        super().__init__(parent)
+        self.phrase = phrase
+
+    def run(self):
+        self.found.emit(self.phrase, Subtitle_search.search(self.phrase))
+
+
+class probe_service(QObject):
+    """ probe media files on a thread pool, results come back through the probed signal """
+    probed = Signal(str, object)  # path, info dict or None
+
+    def __init__(self, parent=None, workers=2):
+        super().__init__(parent)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="probe")
+
+    def request(self, path):
+        future = self._pool.submit(Media_probe.probe, path)
+        future.add_done_callback(lambda f: self._done(path, f))
+        return future
+
+    def _done(self, path, future):
+        # the signal is queued to the thread of this object, so receivers run on the UI thread
+        if not future.cancelled():
+            self.probed.emit(path, future.result())
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class thumbnail_service(QObject):
+    """ decode video frames in a process pool, finished thumbnails are kept in the disk cache """
+    thumbnail_ready = Signal(str, int, int, bytes)  # path, position, width, jpeg data
+    thumbnail_failed = Signal(str, int, int)  # path, position, width
+
+    def __init__(self, parent=None, workers=None):
+        super().__init__(parent)
+        self.cache = Thumbnail.shared_cache()
+        self._workers = workers or max(1, (os.cpu_count() or 2) // 2)
+        self._pool = None
+        # the stat and the disk cache read of a request, and the first scan of the cache folder, run here
+        self._lookups = ThreadPoolExecutor(max_workers=1, thread_name_prefix="thumbnail cache")
+        # reentrant, a decode that is done already runs its callback inside submit's add_done_callback
+        self._lock = threading.RLock()
+        # (path, position, width) -> decode future, None while the cache is looked up
+        self._pending = {}
+        # bumped by cancel_pending, lookups of an older generation are dropped
+        self._generation = 0
+        self._ffmpeg = None
+
+    def request(self, path, position, width):
+        """ send the thumbnail if it is cached, decode it in the pool otherwise, the UI thread never waits """
+        with self._lock:
+            if (path, position, width) in self._pending or self._lookups is None:
+                return
+            self._pending[(path, position, width)] = None
+            self._lookups.submit(self._lookup, self._generation, path, position, width)
+
+    def _lookup(self, generation, path, position, width):
+        try:
+            key = Thumbnail.file_key(path, *Media_probe.file_identity(path))
+        except OSError:
+            key = None
+        data = None if key is None else self.cache.get(key, position, width)
+        with self._lock:
+            if generation != self._generation:
+                return
+            if data is None and key is not None:
+                if self._pool is None:
+                    self._ffmpeg = Media_probe.ffmpeg_binary()
+                    if self._ffmpeg is not None:
+                        self._pool = ProcessPoolExecutor(max_workers=self._workers)
+                if self._pool is not None:
+                    future = self._pool.submit(Thumbnail.extract_frame, self._ffmpeg, path, position, width)
+                    self._pending[(path, position, width)] = future
+                    future.add_done_callback(lambda f: self._done(key, path, position, width, f))
+                    return
+            self._pending.pop((path, position, width), None)
+        if data is not None:
+            self.thumbnail_ready.emit(path, position, width, data)
+        else:
+            self.thumbnail_failed.emit(path, position, width)
+
+    def _done(self, key, path, position, width, future):
+        with self._lock:
+            if self._pending.get((path, position, width)) is future:
+                del self._pending[(path, position, width)]
+        if future.cancelled():
+            return
+        data = future.result()
+        if data:
+            self.cache.put(key, position, width, data)
+            self.thumbnail_ready.emit(path, position, width, data)
+        else:
+            self.thumbnail_failed.emit(path, position, width)
+
+    def cancel_pending(self):
+        """ drop the requests that did not start yet, e.g. when another file is opened """
+        with self._lock:
+            self._generation += 1
+            # cancel runs the done callback at once, it removes the entry
+            for future in list(self._pending.values()):
+                if future is not None:
+                    future.cancel()
+            self._pending.clear()
+
+    def shutdown(self):
+        self.cancel_pending()
+        with self._lock:
+            lookups, self._lookups = self._lookups, None
+        if lookups is not None:
+            lookups.shutdown(wait=False, cancel_futures=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+if __name__ == "__main__":
+    pass
@@ -6,42 +6,52 @@
 
 from PySide6.QtWidgets import QApplication
 import Player
-import sqlite3
+import Database
+import Media_probe
+import Library
+import Subtitle_search
+import Resume
+import Keyframes
 
 def initialize_database():
     # create correct daba.db
     # connect to database
-    conn = sqlite3.connect('data.db')
+    Database.connection()
     print ("connect database successfully!")
-    c = conn.cursor()
     # create tables if not exists
-    c.execute('''CREATE TABLE IF NOT EXISTS MAIN_WINDOW
+    Database.execute('''CREATE TABLE IF NOT EXISTS MAIN_WINDOW
                 (ID     INT NOT NULL,
                     X      INT NOT NULL,
                     Y      INT NOT NULL,
                     Width  INT NOT NULL,
                     Height INT NOT NULL);''')
-    c.execute('''CREATE TABLE IF NOT EXISTS TIMELINE_WINDOW
+    Database.execute('''CREATE TABLE IF NOT EXISTS TIMELINE_WINDOW
                 (ID     INT NOT NULL,
                     X      INT NOT NULL,
                     Y      INT NOT NULL,
                     Width  INT NOT NULL,
                     Height INT NOT NULL);''')
-    c.execute('''CREATE TABLE IF NOT EXISTS EDITOR_WINDOW
+    Database.execute('''CREATE TABLE IF NOT EXISTS EDITOR_WINDOW
                 (ID     INT NOT NULL,
                     X      INT NOT NULL,
                     Y      INT NOT NULL,
                     Width  INT NOT NULL,
                     Height INT NOT NULL);''')
-    c.execute('''CREATE TABLE IF NOT EXISTS PLAYLIST
+    Database.execute('''CREATE TABLE IF NOT EXISTS PLAYLIST
                 (NAME TEXT NOT NULL);''')
-    c.execute('''CREATE TABLE IF NOT EXISTS CURRENT_VIDEO_INFO
+    Database.execute('''CREATE TABLE IF NOT EXISTS CURRENT_VIDEO_INFO
                 (PATH_VIDEO TEXT NOT NULL,
                     LAST_PATH  TEXT NOT NULL,
                     DURATION   INT  NOT NULL);''')
+    # the UPDATE in save_current_video_info needs a row to update
+    Database.execute('''INSERT INTO CURRENT_VIDEO_INFO SELECT '', '', 1000
+                WHERE NOT EXISTS (SELECT 1 FROM CURRENT_VIDEO_INFO);''')
+    Media_probe.create_table()
+    Library.create_table()
+    Subtitle_search.create_table()
+    Resume.create_table()
+    Keyframes.create_table()
     print ("the tables are ready!")
-    conn.commit()
-    conn.close()
 
 
 if __name__ == "__main__":